@@ -0,0 +1,224 @@
+# Benchmarks the dashboard's data pipeline on synthetic History / Engagement_Weekly
+# frames, no network or credentials needed.
+#
+#   python bench.py                               # full grid, prints a table
+#   python bench.py --students 100 1000 --days 30
+#   python bench.py --save bench/baseline.json    # record results
+#   python bench.py --compare bench/baseline.json # exit 1 if a step got slower
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import pipeline
+
+STUDENTS = [100, 1000, 10000]
+DAYS = [30, 365]
+START = date(2025, 1, 6)
+QUERIES = ["student 42", "stu", "user42ig", "studnet 4"]  # exact, prefix, username, typo
+
+# ---- Synthetic sheets ----
+# Same columns and cell types as sheet_frame() gives for the real sheets: numbers
+# numericised, blanks as "", follower counts sometimes written as "1.2K" and
+# comment counts as "1,234". One row per student per day, with ~3% of scrapes
+# missing. Strings come from small pools so a 10k x 365 frame still fits in memory.
+def _object_column(values, blank, text_mask=None, text_values=None):
+    col = values.astype(object)
+    if text_mask is not None:
+        col[text_mask] = text_values[text_mask]
+    col[blank] = ""
+    return col
+
+def synthetic_history(n_students, n_days, seed=0):
+    rng = np.random.default_rng(seed)
+    student = np.tile(np.arange(n_students), n_days)
+    day = np.repeat(np.arange(n_days), n_students)
+    keep = rng.random(len(student)) >= 0.03
+    student, day = student[keep], day[keep]
+    n = len(student)
+    ids = np.array([f"S{i:05d}" for i in range(n_students)], dtype=object)
+    names = np.array([f"Student {i}" for i in range(n_students)], dtype=object)
+    dates = np.array([(START + timedelta(days=d)).isoformat() for d in range(n_days)], dtype=object)
+    frame = {"StudentID": ids[student], "Name": names[student], "Date": dates[day]}
+    post_dates = np.array([(START + timedelta(days=d)).isoformat() + "T10:00:00Z" for d in range(-9, n_days)], dtype=object)
+    captions = np.array([f"Post {i} of the week" for i in range(50)], dtype=object)
+    for i, prefix in enumerate(pipeline.PLATFORM_PREFIXES):
+        uses = (rng.random(n_students) < 0.7)[student]
+        blank = ~uses
+        base = rng.lognormal(7, 1.5, n_students).astype(np.int64)
+        daily = rng.integers(0, 40, n_students)
+        foll = base[student] + daily[student] * day + rng.integers(0, 5, n)
+        as_k = (foll >= 1000) & (rng.random(n) < 0.2)
+        k_text = np.char.add(np.round(foll / 1000, 1).astype(str), "K").astype(object)
+        likes = (foll * rng.uniform(0, 0.08, n)).astype(np.int64)
+        comments = (likes * rng.uniform(0, 0.3, n)).astype(np.int64)
+        comma = comments >= 1000
+        comma_text = np.full(n, "", dtype=object)
+        comma_text[comma] = [f"{c:,}" for c in comments[comma]]
+        users = np.array([f"user{s}{prefix.lower()}" for s in range(n_students)], dtype=object)
+        post_day = day + 9 - rng.integers(0, 10, n)
+        frame[f"{prefix}_Username"] = np.where(blank, "", users[student])
+        frame[f"{prefix}_Followers"] = _object_column(foll, blank, as_k, k_text)
+        frame[f"{prefix}_Followers_Last"] = np.full(n, "", dtype=object)
+        frame[f"{prefix}_LaPostLikes"] = _object_column(likes, blank)
+        frame[f"{prefix}_LaPostComments"] = _object_column(comments, blank, comma, comma_text)
+        frame[f"{prefix}_LaPostDate"] = np.where(blank, "", post_dates[post_day])
+        frame[f"{prefix}_LaPostCaption"] = np.where(blank, "", captions[(student + day) % len(captions)])
+        frame[f"{prefix}_LaPostURL"] = np.where(blank, "", "https://example.com/p/" + str(i))
+        frame[f"{prefix}_LaPostPreview"] = np.where(blank | (student % 2 == 0), "", "https://example.com/img.png")
+    frame["LI_Connections"] = (student + 100).astype(np.int64)
+    frame["YT_ChannelTitle"] = np.array([f"Channel {s}" for s in range(n_students)], dtype=object)[student]
+    frame["YT_ChannelViews"] = student.astype(np.int64) * 1000
+    return pd.DataFrame(frame)
+
+def synthetic_weekly(n_students, n_days, seed=1):
+    rng = np.random.default_rng(seed)
+    n_weeks = max(1, -(-n_days // 7))
+    student = np.tile(np.arange(n_students), n_weeks)
+    week = np.repeat(np.arange(n_weeks), n_students)
+    n = len(student)
+    weeks = np.array([(START + timedelta(weeks=w)).isoformat() for w in range(n_weeks)], dtype=object)
+    return pd.DataFrame({
+        "Name": np.array([f"Student {i}" for i in range(n_students)], dtype=object)[student],
+        "Week": weeks[week],
+        "Videos_Posted": rng.integers(0, 8, n),
+        "Zoom_Calls_Attended": rng.integers(0, 4, n),
+        "Discord_Feedback_Requested": rng.integers(0, 5, n),
+        "Course_Completed_Percent": np.minimum(100, week * 100 // n_weeks + rng.integers(0, 10, n)),
+    })
+
+# ---- Steps ----
+# Each step gets the state built by the ones before it, mirroring what one data
+# refresh plus a typical session computes.
+def _normalize(state):
+    state["df"], state["weekly"], state["version"] = pipeline.prepare_frames(state["raw"], state["raw_weekly"])
+
+def _snapshot(state):
+    state["snap"] = pipeline.latest_snapshot(state["df"])
+
+def _index(state):
+    state["index"] = pipeline.history_index(state["df"])
+
+def _leaderboard(state):
+    pipeline.leaderboard_cube(state["snap"], state["index"])
+
+def _leaderboard_window(state):
+    # A 7-day range picked in Analytics, every metric on one platform.
+    end = state["df"]['Date'].max()
+    start = end - pd.Timedelta(days=6)
+    snap = pipeline.latest_snapshot(state["df"], str(start), str(end))
+    for metric in pipeline.METRICS:
+        table, y_col = pipeline.metric_frame(snap, state["index"], "IG", metric, start, end)
+        pipeline.rank_students(table, y_col)
+
+def _growth(state):
+    pipeline.growth_table(state["df"], pipeline.PLATFORM_PREFIXES)
+
+def _heatmap(state):
+    pipeline.post_heatmap(state["df"], "All Students")
+    pipeline.post_heatmap(state["df"], "Student 42")
+
+def _search_index(state):
+    state["search"] = pipeline.search_index(state["snap"])
+
+def _search(state):
+    for query in QUERIES:
+        pipeline.search_students(state["search"], query)
+
+STEPS = [
+    ("normalize", _normalize),
+    ("snapshot", _snapshot),
+    ("history_index", _index),
+    ("leaderboard", _leaderboard),
+    ("leaderboard_window", _leaderboard_window),
+    ("growth", _growth),
+    ("heatmap", _heatmap),
+    ("search_index", _search_index),
+    ("search", _search),
+]
+
+def run_case(n_students, n_days, repeat):
+    state = {"raw": synthetic_history(n_students, n_days), "raw_weekly": synthetic_weekly(n_students, n_days)}
+    results = {"rows": len(state["raw"])}
+    for name, step in STEPS:
+        times = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            step(state)
+            times.append((time.perf_counter() - started) * 1000)
+        results[name] = round(min(times), 3)
+    return results
+
+# ---- Recording ----
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+    }
+
+def regressions(results, baseline, tolerance, floor_ms):
+    # Steps more than `tolerance` slower than the baseline; sub-floor_ms steps are noise.
+    found = []
+    for case, steps in results["cases"].items():
+        before = baseline["cases"].get(case, {})
+        for name, ms in steps.items():
+            if name == "rows" or name not in before:
+                continue
+            if ms > floor_ms and ms > before[name] * (1 + tolerance):
+                found.append((case, name, before[name], ms))
+    return found
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard data pipeline on synthetic data.")
+    parser.add_argument("--students", type=int, nargs="+", default=STUDENTS)
+    parser.add_argument("--days", type=int, nargs="+", default=DAYS)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per step; the fastest is kept")
+    parser.add_argument("--save", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --save")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--floor-ms", type=float, default=5.0, help="ignore steps faster than this")
+    args = parser.parse_args(argv)
+
+    results = {"env": environment(), "repeat": args.repeat, "cases": {}}
+    names = [name for name, _ in STEPS]
+    print(f"{'case':>12} {'rows':>9} " + " ".join(f"{n:>18}" for n in names))
+    for n_students in args.students:
+        for n_days in args.days:
+            case = f"{n_students}x{n_days}"
+            res = run_case(n_students, n_days, args.repeat)
+            results["cases"][case] = res
+            print(f"{case:>12} {res['rows']:>9} " + " ".join(f"{res[n]:>18.1f}" for n in names), flush=True)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        found = regressions(results, baseline, args.tolerance, args.floor_ms)
+        for case, name, before, after in found:
+            print(f"REGRESSION {case} {name}: {before:.1f} ms -> {after:.1f} ms")
+        if found:
+            return 1
+        print(f"No regressions against {args.compare} (commit {baseline['env'].get('commit') or '?'}).")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
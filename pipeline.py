@@ -0,0 +1,587 @@
+# Data pipeline behind the dashboard: normalization, snapshots, the date-range
+# index, growth, leaderboards, heatmap and search. Plain pandas/numpy with no
+# Streamlit, so bench.py and precompute.py can import it; sm.py wraps the
+# expensive steps in st.cache_* keyed on data_version.
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+SHEET_ID = '1MvGIdmM9eW89vSIoMzlg6k8x6oXBr1XKfrCoLIBkzq0'
+SHEET_NAME = 'History'
+WEEKLY_SHEET_NAME = 'Engagement_Weekly'
+scope = [
+    'https://spreadsheets.google.com/feeds',
+    'https://www.googleapis.com/auth/drive'
+]
+
+GROWTH_DAYS = 7
+LEADERBOARD_SIZE = 10
+PLATFORM_PREFIXES = ["IG", "TT", "YT", "TH", "LI"]
+METRICS = ['Followers', 'Engagement', 'Follower Growth']
+
+def parse_number(val):
+    if pd.isna(val) or str(val).strip().lower() in ["", "none", "n/a"]:
+        return 0.0
+    val = str(val).replace(",", "").strip().upper()
+    try:
+        if val.endswith("K"):
+            return float(val[:-1]) * 1000
+        elif val.endswith("M"):
+            return float(val[:-1]) * 1000000
+        else:
+            return float(val)
+    except:
+        return 0.0
+
+def parse_numbers(values):
+    # Column version of parse_number(): same results, one pass of pandas string ops.
+    s = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_bool_dtype(s):
+        return pd.Series(0.0, index=s.index)
+    if pd.api.types.is_numeric_dtype(s):
+        return s.astype(float).fillna(0.0)
+    missing = s.isna()
+    txt = s.astype(str).str.replace(",", "", regex=False).str.strip().str.upper()
+    mult = np.select([txt.str.endswith("K"), txt.str.endswith("M")], [1000.0, 1000000.0], 1.0)
+    body = txt.where(mult == 1.0, txt.str[:-1])
+    # to_numeric only finds the parseable rows: its own parser can be off by one ulp on
+    # long decimals, so the values themselves come from numpy's float() conversion.
+    valid = pd.to_numeric(body, errors="coerce").notna()
+    out = pd.Series(np.nan, index=s.index)
+    out[valid] = body[valid].to_numpy(dtype=object).astype(float)
+    # Anything to_numeric rejects goes through float() once per distinct string, so
+    # sentinels and odd spellings ("1_000", "nan", "inf") parse exactly as before.
+    retry = ~valid & ~missing
+    if retry.any():
+        lookup = {}
+        for v in pd.unique(body[retry]):
+            try:
+                lookup[v] = float(v)
+            except ValueError:
+                lookup[v] = 0.0
+        out[retry] = body[retry].map(lookup)
+    return (out * mult).where(~missing, 0.0)
+
+# ---- Normalization ----
+# Runs once per data refresh, so every rerun starts from frames with a fixed
+# schema: Date parsed, rows sorted and de-duplicated, IDs/names as categoricals
+# and metric columns shrunk to float32 wherever no value changes.
+METRIC_KEYWORDS = ["followers", "likes", "comments"]
+WEEKLY_METRICS = ["Videos_Posted", "Zoom_Calls_Attended", "Discord_Feedback_Requested", "Course_Completed_Percent"]
+
+def _compact(col):
+    # float32 halves the metric columns, but only if no value changes.
+    small = col.astype("float32")
+    if (small.astype(float) == col)[col.notna()].all():
+        return small
+    return col
+
+def normalize_history(raw):
+    if raw.empty or 'Date' not in raw.columns:
+        return raw
+    df = raw.copy()
+    for col in df.columns:
+        if any(x in col.lower() for x in METRIC_KEYWORDS):
+            df[col] = _compact(pd.to_numeric(df[col].replace(["", " ", None, "none", "n/a", "N/A"], np.nan), errors="coerce"))
+    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    df = df.sort_values("Date").drop_duplicates(subset=["StudentID", "Date"], keep="last")
+    for col in ["StudentID", "Name"]:
+        df[col] = df[col].astype("category")
+    return df
+
+def normalize_weekly(raw):
+    if raw.empty or 'Week' not in raw.columns:
+        return pd.DataFrame()
+    weekly = raw.copy()
+    weekly['Week'] = pd.to_datetime(weekly['Week'], errors='coerce')
+    for col in WEEKLY_METRICS:
+        if col in weekly.columns:
+            weekly[col] = pd.to_numeric(weekly[col], errors="coerce")
+    return weekly
+
+def prepare_frames(raw, raw_weekly):
+    # data_version changes whenever the prepared History does; derived caches key on it.
+    # The index is hashed too: growth_table() points at rows by label, and a cohort
+    # re-sliced from a later sync can hold the same rows under different labels.
+    df = normalize_history(raw)
+    version = hashlib.sha1(pd.util.hash_pandas_object(df, index=True).values.tobytes()).hexdigest()[:16]
+    return df, normalize_weekly(raw_weekly), version
+
+# ---- Latest snapshot ----
+# groupby("StudentID").last() over an optional date window.
+def latest_snapshot(df, start=None, end=None):
+    rows = df
+    if start is not None:
+        rows = rows[(rows['Date'] >= pd.Timestamp(start)) & (rows['Date'] <= pd.Timestamp(end))]
+    # History is already sorted by Date in normalize_history().
+    return rows.groupby("StudentID", observed=True).last().reset_index()
+
+# ---- Date-range index ----
+# Rows keyed by (student code, day rank) in sorted int64 arrays, one set per
+# follower/likes column holding only its non-null rows. The first/last value of
+# any window is then two searchsorted calls per student, with no frame copies.
+def history_index(df):
+    rows = df[df['Date'].notna()]
+    days, day_rank = np.unique(rows['Date'].to_numpy(), return_inverse=True)
+    student = rows['StudentID'].cat.codes.to_numpy().astype(np.int64)
+    keys = student * len(days) + day_rank.ravel()
+    order = np.argsort(keys, kind="stable")
+    index = {
+        "days": days,
+        "students": rows['StudentID'].cat.categories,
+        "names": rows['Name'].array[order],
+        "keys": keys[order],
+        "series": {},
+    }
+    for col in rows.columns:
+        if col.endswith("_Followers") or col.endswith("_LaPostLikes"):
+            values = rows[col].to_numpy()[order]
+            present = ~pd.isna(values)
+            index["series"][col] = (index["keys"][present], values[present])
+    return index
+
+def _window_bounds(index, keys, start, end):
+    days = index["days"]
+    lo_day = 0 if start is None else np.searchsorted(days, pd.Timestamp(start).to_datetime64(), "left")
+    hi_day = len(days) if end is None else np.searchsorted(days, pd.Timestamp(end).to_datetime64(), "right")
+    base = np.arange(len(index["students"]), dtype=np.int64) * len(days)
+    return np.searchsorted(keys, base + lo_day, "left"), np.searchsorted(keys, base + hi_day, "left")
+
+def window_ends(index, col, start=None, end=None):
+    # StudentID, Name, first and last non-null `col` value per student with rows in [start, end].
+    lo, hi = _window_bounds(index, index["keys"], start, end)
+    seen = hi > lo
+    out = pd.DataFrame({
+        "StudentID": pd.Categorical.from_codes(np.flatnonzero(seen), index["students"]),
+        "Name": index["names"][hi[seen] - 1],
+    })
+    keys, values = index["series"].get(col, (np.empty(0, np.int64), np.empty(0)))
+    lo, hi = _window_bounds(index, keys, start, end)
+    lo, hi = lo[seen], hi[seen]
+    has = hi > lo
+    if len(values):
+        first = values[np.where(has, lo, 0)]
+        last = values[np.where(has, hi - 1, 0)]
+        if not has.all():
+            first, last = np.where(has, first, np.nan), np.where(has, last, np.nan)
+    else:
+        first = last = np.full(len(out), np.nan)
+    out["first"], out["last"] = first, last
+    return out
+
+def date_window(frame, start, end):
+    # History frames stay sorted by Date (NaT last), so a window is one contiguous slice.
+    dates = frame['Date'].to_numpy()
+    lo = np.searchsorted(dates, pd.Timestamp(start).to_datetime64(), "left")
+    hi = np.searchsorted(dates, pd.Timestamp(end).to_datetime64(), "right")
+    return frame.iloc[lo:hi]
+
+# ---- Follower growth table ----
+# One row per student x platform: latest followers, growth over GROWTH_DAYS
+# (as-of join against the value at or before latest - GROWTH_DAYS, falling back
+# to the first reading) and latest-post engagement. "row" is the index label of
+# the latest reading, for the card's post details.
+def growth_table(df, prefixes, days=GROWTH_DAYS):
+    dated = df[df['Date'].notna()]
+    name_codes = dated['Name'].cat.codes
+    parts = []
+    for prefix in prefixes:
+        foll_col, likes_col = f"{prefix}_Followers", f"{prefix}_LaPostLikes"
+        if foll_col not in dated.columns:
+            continue
+        has = dated[foll_col].notna()
+        rows = pd.DataFrame({
+            "code": name_codes[has],
+            "Date": dated.loc[has, 'Date'],
+            "foll": parse_numbers(dated.loc[has, foll_col]),
+        })
+        if rows.empty:
+            continue
+        last = rows.drop_duplicates("code", keep="last")
+        first = rows.drop_duplicates("code", keep="first").set_index("code")["foll"]
+        prev = pd.merge_asof(
+            pd.DataFrame({"code": last["code"].values, "Date": last["Date"].values - pd.Timedelta(days=days)}).sort_values("Date"),
+            rows, on="Date", by="code", direction="backward",
+        ).set_index("code")["foll"]
+        prev = prev.reindex(last["code"].values).fillna(first.reindex(last["code"].values)).values
+        likes = parse_numbers(dated.loc[last.index, likes_col]).values if likes_col in dated.columns else np.zeros(len(last))
+        latest = last["foll"].values
+        parts.append(pd.DataFrame({
+            "Name": dated.loc[last.index, 'Name'].astype(str).values,
+            "prefix": prefix,
+            "row": last.index,
+            "latest_foll": latest,
+            "growth": latest - prev,
+            "likes": likes,
+            "engagement": np.where(latest != 0, likes / np.where(latest != 0, latest, 1) * 100, 0.0),
+        }))
+    if not parts:
+        return pd.DataFrame(columns=["Name", "prefix", "row", "latest_foll", "growth", "likes", "engagement"]).set_index(["Name", "prefix"])
+    return pd.concat(parts, ignore_index=True).set_index(["Name", "prefix"])
+
+# ---- Leaderboard metrics ----
+def growth_between(index, foll_col, start=None, end=None):
+    ends = window_ends(index, foll_col, start, end)
+    growth_df = ends[["StudentID", "Name"]].copy()
+    growth_df["Followers_End"] = parse_numbers(ends["last"])
+    growth_df["Followers_Start"] = parse_numbers(ends["first"])
+    growth_df["Growth"] = growth_df["Followers_End"] - growth_df["Followers_Start"]
+    return growth_df
+
+def _metric_column(frame, col):
+    # A column the sheet doesn't have counts as zero for everyone, as growth_between() does.
+    return parse_numbers(frame[col]) if col in frame.columns else pd.Series(0.0, index=frame.index)
+
+def metric_frame(snap, index, prefix, metric, start=None, end=None):
+    # (table, value column) for one platform/metric. snap is the latest row per student
+    # in the window; growth reads the window's ends from the date-range index.
+    foll_col = f"{prefix}_Followers"
+    if metric == "Follower Growth":
+        return growth_between(index, foll_col, start, end), "Growth"
+    latest = snap.copy()
+    latest[foll_col] = _metric_column(latest, foll_col)
+    if metric == "Followers":
+        return latest, foll_col
+    likes_col = f"{prefix}_LaPostLikes"
+    latest[likes_col] = _metric_column(latest, likes_col)
+    latest['eng'] = (latest[likes_col] / latest[foll_col]).where(latest[foll_col] != 0, 0.0)
+    latest['eng'] = latest['eng'] * 100
+    return latest, 'eng'
+
+def rank_students(frame, value_col, k=LEADERBOARD_SIZE):
+    # Top k rows, best first. nlargest is a partial sort, so this stays cheap on big cohorts.
+    return frame.nlargest(k, value_col, keep="first")
+
+def leaderboard_cube(snap, index, prefixes=PLATFORM_PREFIXES):
+    # Top-k ranking for every platform x metric over the whole history.
+    cube = {}
+    for prefix in prefixes:
+        for metric in METRICS:
+            table, y_col = metric_frame(snap, index, prefix, metric)
+            cube[(prefix, metric)] = (y_col, rank_students(table, y_col))
+    return cube
+
+# ---- Content heatmap ----
+# Posts per day binned with bincount on day offsets, laid out one row per ISO
+# (year, week) so weeks from different years never share a row.
+def post_heatmap(df, student):
+    dates = df['Date'] if student == "All Students" else df.loc[df['Name'] == student, 'Date']
+    days = dates.dropna().to_numpy().astype("datetime64[D]").astype(np.int64)
+    if not len(days):
+        return None
+    weekday = (days + 3) % 7  # 1970-01-01 was a Thursday; Monday = 0
+    first_monday = days.min() - (days.min() + 3) % 7
+    week_row = (days - first_monday) // 7
+    n_weeks = int(week_row.max()) + 1
+    z = np.bincount(week_row * 7 + weekday, minlength=n_weeks * 7).reshape(n_weeks, 7).astype(float)
+    mondays = pd.to_datetime(first_monday + 7 * np.arange(n_weeks), unit="D")
+    iso = mondays.isocalendar()
+    if iso['year'].nunique() == 1:
+        weeks = [f"Week {w}" for w in iso['week']]
+    else:
+        weeks = [f"Week {w}, {y}" for y, w in zip(iso['year'], iso['week'])]
+    return {"z": z, "weeks": weeks}
+
+# ---- Creator search ----
+# Each student's name, platform usernames and StudentID, normalized and joined
+# into one "|"-separated string, plus a trigram index over them. Exact, prefix
+# and substring hits come from vectorized string scans; only when nothing
+# contains the query do the trigrams supply typo-tolerant matches, and then only
+# those close to the best one.
+SEARCH_MIN_SIMILARITY = 0.4
+SEARCH_FUZZY_RELATIVE = 0.8
+
+def _search_norm(text):
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode().lower()
+    return re.sub(r"[^a-z0-9]+", " ", text).strip()
+
+def _trigrams(text):
+    grams = set()
+    for token in text.split():
+        padded = f" {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def search_index(snapshot):
+    user_cols = [c for c in snapshot.columns if c.endswith("_Username")]
+    joined, postings = [], {}
+    for pos, rec in enumerate(snapshot[["Name", "StudentID"] + user_cols].itertuples(index=False)):
+        texts = [t for t in (_search_norm(v) for v in rec if not pd.isna(v)) if t]
+        joined.append("|" + "|".join(texts) + "|")
+        keys = set().union(*map(_trigrams, texts)) if texts else set()
+        for key in keys:
+            postings.setdefault(key, []).append(pos)
+    postings = {key: np.array(hits, dtype=np.int32) for key, hits in postings.items()}
+    return {"text": pd.Series(joined, dtype="string[pyarrow]"), "postings": postings, "size": len(joined)}
+
+def search_students(index, query, limit=None):
+    # Returns snapshot row positions, best match first (all matches unless limit is given).
+    q = _search_norm(query)
+    if not q:
+        return []
+    cover = np.ones(index["size"])
+    if len(q) >= 3:
+        grams = _trigrams(q)
+        hits = [index["postings"][g] for g in grams if g in index["postings"]]
+        if hits:
+            cover = np.bincount(np.concatenate(hits), minlength=index["size"]) / len(grams)
+    text = index["text"]
+    cand = np.flatnonzero(text.str.contains(q, regex=False).to_numpy(dtype=bool))
+    if len(cand):
+        found = text.iloc[cand]
+        exact = found.str.contains(f"|{q}|", regex=False).to_numpy(dtype=bool)
+        prefix = (found.str.contains(f"|{q}", regex=False) | found.str.contains(f" {q}", regex=False)).to_numpy(dtype=bool)
+        tier = np.select([exact, prefix], [3, 2], 1)
+    elif len(q) >= 3 and hits:
+        # Nothing contains the query: keep the trigram matches closest to the best one.
+        cand = np.flatnonzero(cover > 0)
+        cand = cand[cover[cand] >= max(SEARCH_MIN_SIMILARITY, cover[cand].max() * SEARCH_FUZZY_RELATIVE)]
+        tier = np.zeros(len(cand), dtype=int)
+    else:
+        return []
+    order = np.lexsort((cand, -cover[cand], -tier))
+    return cand[order][:limit].tolist()
+
+# ---- Cohorts ----
+# History may carry a Cohort column; each cohort is a partition that is mirrored,
+# normalized and aggregated on its own, so a session only touches its cohort's
+# rows. Sheets without the column are one partition. The summaries are small
+# per-cohort aggregates the cross-cohort view compares without loading any rows.
+COHORT_COL = "Cohort"
+DEFAULT_COHORT = "All"
+UNASSIGNED_COHORT = "Unassigned"
+
+def cohort_labels(frame):
+    labels = frame[COHORT_COL].where(frame[COHORT_COL].notna(), "").astype(str).str.strip()
+    return labels.where(~labels.isin(["", "nan", "None"]), UNASSIGNED_COHORT)
+
+def split_cohorts(raw, raw_weekly):
+    # {cohort: (History rows, Engagement_Weekly rows)}, sheet order kept. Weekly rows go
+    # by their own Cohort column when the sheet has one, otherwise by student name.
+    if raw.empty:
+        return {}
+    if COHORT_COL not in raw.columns:
+        return {DEFAULT_COHORT: (raw, raw_weekly)}
+    by_column = COHORT_COL in raw_weekly.columns
+    weekly_labels = cohort_labels(raw_weekly) if by_column else None
+    parts = {}
+    for cohort, rows in raw.groupby(cohort_labels(raw), sort=False):
+        if by_column:
+            weekly = raw_weekly[weekly_labels == cohort]
+        elif 'Name' in raw_weekly.columns:
+            weekly = raw_weekly[raw_weekly['Name'].isin(rows['Name'].unique())]
+        else:
+            weekly = raw_weekly
+        parts[cohort] = (rows, weekly)
+    return parts
+
+def row_hashes(frame):
+    # One uint64 per row, independent of the other rows, so the hashes of a synced
+    # sheet can be computed once and sliced per cohort or extended by new rows.
+    return pd.util.hash_pandas_object(frame.astype(str), index=False)
+
+def frame_digest(frame, hashes=None):
+    # hashes: row_hashes() of a frame `frame` was sliced from, to skip re-hashing it.
+    hashes = row_hashes(frame) if hashes is None else hashes.loc[frame.index]
+    return hashlib.sha1(hashes.to_numpy().tobytes()).hexdigest()
+
+def partition_digest(raw, raw_weekly, hashes=None, weekly_hashes=None):
+    # Changes whenever either sheet's rows for the cohort do; a cohort that gets no new
+    # rows keeps its digest, so nothing derived from it is rebuilt.
+    return hashlib.sha1((frame_digest(raw, hashes) + frame_digest(raw_weekly, weekly_hashes)).encode()).hexdigest()[:16]
+
+def cohort_slug(cohort):
+    # Folder name for a cohort's files; the hash keeps distinct names distinct.
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", cohort)[:40] + "-" + hashlib.sha1(cohort.encode()).hexdigest()[:6]
+
+def cohort_summary(df, weekly, prefixes=PLATFORM_PREFIXES):
+    dates = df['Date'].dropna()
+    growth = growth_table(df, prefixes)
+    active = growth[growth["latest_foll"] > 0]
+    platforms = pd.DataFrame({
+        "prefix": list(prefixes),
+        "students": [int((active.index.get_level_values("prefix") == p).sum()) for p in prefixes],
+    })
+    by_prefix = active.groupby(level="prefix")
+    platforms["followers"] = platforms["prefix"].map(by_prefix["latest_foll"].sum()).fillna(0.0)
+    platforms["median_followers"] = platforms["prefix"].map(by_prefix["latest_foll"].median()).fillna(0.0)
+    platforms["growth"] = platforms["prefix"].map(by_prefix["growth"].sum()).fillna(0.0)
+    platforms["engagement"] = platforms["prefix"].map(by_prefix["engagement"].mean()).fillna(0.0)
+    # Average followers per student (all platforms) by week since the cohort's first reading.
+    dated = df[df['Date'].notna()]
+    foll_cols = [f"{p}_Followers" for p in prefixes if f"{p}_Followers" in dated.columns]
+    total = sum((parse_numbers(dated[c]).to_numpy() for c in foll_cols), np.zeros(len(dated)))
+    readings = pd.DataFrame({
+        "student": dated['StudentID'].cat.codes.to_numpy(),
+        "week": (dated['Date'] - dates.min()).dt.days.to_numpy() // 7 + 1,
+        "followers": total,
+    }).drop_duplicates(["student", "week"], keep="last")
+    trajectory = readings.groupby("week", as_index=False)["followers"].mean()
+    overview = {
+        "students": int(df['StudentID'].nunique()),
+        "rows": len(df),
+        "first_date": str(dates.min().date()) if len(dates) else None,
+        "last_date": str(dates.max().date()) if len(dates) else None,
+    }
+    if 'Videos_Posted' in weekly.columns and not weekly.empty:
+        overview["videos_per_week"] = float(weekly.groupby('Week')['Videos_Posted'].sum().mean())
+    return {"overview": overview, "platforms": platforms, "trajectory": trajectory}
+
+# Partitioned mirror: <root>/<cohort slug>/ holds the cohort's raw History and
+# Engagement_Weekly rows plus its summary tables; <root>/index.json maps each
+# cohort to its folder, digest and overview. Loading one cohort reads one folder.
+def read_partition_index(root):
+    path = os.path.join(root, "index.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def write_partition_index(root, index):
+    os.makedirs(root, exist_ok=True)
+    _atomic_json(os.path.join(root, "index.json"), index)
+
+def write_partition(root, cohort, raw, raw_weekly, digest, summary):
+    path = os.path.join(root, cohort_slug(cohort))
+    os.makedirs(path, exist_ok=True)
+    tables = [(SHEET_NAME, raw), (WEEKLY_SHEET_NAME, raw_weekly), ("platforms", summary["platforms"]), ("trajectory", summary["trajectory"])]
+    for name, frame in tables:
+        tmp = os.path.join(path, f"{name}.parquet.tmp")
+        parquet_safe(frame).to_parquet(tmp, index=False)
+        os.replace(tmp, os.path.join(path, f"{name}.parquet"))
+    return {"dir": cohort_slug(cohort), "digest": digest, "overview": summary["overview"]}
+
+def read_partition(root, meta):
+    path = os.path.join(root, meta["dir"])
+    return tuple(pd.read_parquet(os.path.join(path, f"{name}.parquet")) for name in [SHEET_NAME, WEEKLY_SHEET_NAME])
+
+def read_summary(root, meta):
+    path = os.path.join(root, meta["dir"])
+    return {
+        "overview": meta["overview"],
+        "platforms": pd.read_parquet(os.path.join(path, "platforms.parquet")),
+        "trajectory": pd.read_parquet(os.path.join(path, "trajectory.parquet")),
+    }
+
+# ---- Precomputed artifact ----
+# Everything the dashboard derives from one cohort's data, materialized ahead of
+# time by precompute.py. <root>/<cohort slug>/<data_version>/ holds one Parquet
+# file per table plus manifest.json; current.json next to it names the newest
+# complete version. The manifest records the partition digest it was built from.
+ARTIFACT_FORMAT = 3
+HEATMAP_DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+def precompute(df, prefixes=PLATFORM_PREFIXES, days=GROWTH_DAYS):
+    # Same inputs the dashboard's cached wrappers use for the full history.
+    dates = df['Date'].dropna()
+    ranged = latest_snapshot(df, str(dates.min()), str(dates.max()))
+    return {
+        "snapshot": ranged,
+        "growth": growth_table(df, prefixes, days),
+        "leaderboard": leaderboard_cube(ranged, history_index(df), prefixes),
+        "heatmap": post_heatmap(df, "All Students"),
+    }
+
+def parquet_safe(frame):
+    # Object columns mixing numbers and text can't be one Parquet type; keep those as text.
+    out = frame.copy()
+    for col in out.columns:
+        if out[col].dtype == object and pd.api.types.infer_dtype(out[col], skipna=True) not in ["string", "integer", "floating", "empty"]:
+            out[col] = out[col].astype(str)
+    return out
+
+def _atomic_json(path, payload):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(payload, f, indent=1)
+    os.replace(tmp, path)
+
+def write_artifact(root, cohort, df, weekly, version, tables, source, source_digest, synced_at,
+                   prefixes=PLATFORM_PREFIXES, days=GROWTH_DAYS, keep=3):
+    root = os.path.join(root, cohort_slug(cohort))
+    path = os.path.join(root, version)
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    parquet_safe(df).to_parquet(os.path.join(tmp, "history.parquet"), index=True)
+    parquet_safe(weekly).to_parquet(os.path.join(tmp, "weekly.parquet"), index=False)
+    parquet_safe(tables["snapshot"]).to_parquet(os.path.join(tmp, "snapshot.parquet"), index=False)
+    tables["growth"].reset_index().to_parquet(os.path.join(tmp, "growth.parquet"), index=False)
+    leaderboards = []
+    for (prefix, metric), (y_col, ranked) in tables["leaderboard"].items():
+        name = f"leaderboard_{prefix}_{metric.replace(' ', '_')}.parquet"
+        parquet_safe(ranked).to_parquet(os.path.join(tmp, name), index=True)
+        leaderboards.append({"prefix": prefix, "metric": metric, "value_col": y_col, "file": name})
+    heatmap = tables["heatmap"]
+    if heatmap is not None:
+        grid = pd.DataFrame(heatmap["z"], columns=HEATMAP_DAYS)
+        grid.insert(0, "week", heatmap["weeks"])
+        grid.to_parquet(os.path.join(tmp, "heatmap.parquet"), index=False)
+    _atomic_json(os.path.join(tmp, "manifest.json"), {
+        "format": ARTIFACT_FORMAT,
+        "data_version": version,
+        "cohort": cohort,
+        "source_digest": source_digest,
+        "created_at": time.time(),
+        "synced_at": synced_at,
+        "source": source,
+        "rows": len(df),
+        "students": int(df['StudentID'].nunique()),
+        "prefixes": list(prefixes),
+        "growth_days": days,
+        "leaderboards": leaderboards,
+        "heatmap": heatmap is not None,
+    })
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    _atomic_json(os.path.join(root, "current.json"), {"data_version": version})
+    # Older versions beyond `keep` are dropped, newest kept first.
+    others = [d for d in os.listdir(root) if d != version and os.path.isfile(os.path.join(root, d, "manifest.json"))]
+    others.sort(key=lambda d: os.path.getmtime(os.path.join(root, d)), reverse=True)
+    for old in others[max(keep - 1, 0):]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return path
+
+def read_artifact(root, cohort, source_digest=None):
+    # The cohort's current artifact as a dict, or None if there isn't one in this
+    # format (or, given source_digest, one built from that exact partition).
+    root = os.path.join(root, cohort_slug(cohort))
+    pointer = os.path.join(root, "current.json")
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer) as f:
+        path = os.path.join(root, json.load(f)["data_version"])
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+    if manifest["format"] != ARTIFACT_FORMAT:
+        return None
+    if source_digest is not None and manifest["source_digest"] != source_digest:
+        return None
+    heatmap = None
+    if manifest["heatmap"]:
+        grid = pd.read_parquet(os.path.join(path, "heatmap.parquet"))
+        heatmap = {"z": grid[HEATMAP_DAYS].to_numpy(dtype=float), "weeks": grid["week"].tolist()}
+    return {
+        "version": manifest["data_version"],
+        "cohort": manifest["cohort"],
+        "source_digest": manifest["source_digest"],
+        "synced_at": manifest["synced_at"],
+        "prefixes": manifest["prefixes"],
+        "growth_days": manifest["growth_days"],
+        "df": pd.read_parquet(os.path.join(path, "history.parquet")),
+        "weekly": pd.read_parquet(os.path.join(path, "weekly.parquet")),
+        "snapshot": pd.read_parquet(os.path.join(path, "snapshot.parquet")),
+        "growth": pd.read_parquet(os.path.join(path, "growth.parquet")).set_index(["Name", "prefix"]),
+        "leaderboard": {
+            (lb["prefix"], lb["metric"]): (lb["value_col"], pd.read_parquet(os.path.join(path, lb["file"])))
+            for lb in manifest["leaderboards"]
+        },
+        "heatmap": heatmap,
+    }
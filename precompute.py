@@ -0,0 +1,115 @@
+# Materializes the dashboard's metrics outside Streamlit: latest snapshot, growth
+# table, leaderboards and heatmap grid for each cohort, written as versioned
+# artifacts the dashboard loads instead of computing them.
+#
+#   python precompute.py                                # from the local mirror
+#   python precompute.py --cohort "2025 Spring"         # just one cohort
+#   python precompute.py --sheets --credentials sa.json # straight from Google Sheets
+#
+# Run it from cron after the sheet updates, or before (re)starting the app.
+import argparse
+import functools
+import json
+import os
+import sys
+import time
+
+import gspread
+import pandas as pd
+from oauth2client.service_account import ServiceAccountCredentials
+
+import pipeline
+
+MIRROR_DIR = os.environ.get("VVC_MIRROR_DIR", ".mirror")
+ARTIFACT_DIR = os.environ.get("VVC_ARTIFACT_DIR", os.path.join(MIRROR_DIR, "artifacts"))
+SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+
+def split_partitions(raw, raw_weekly):
+    # {cohort: (partition digest, load)}, digested the same way the dashboard does.
+    return {
+        cohort: (pipeline.partition_digest(rows, weekly), functools.partial(tuple, (rows, weekly)))
+        for cohort, (rows, weekly) in pipeline.split_cohorts(raw, raw_weekly).items()
+    }
+
+def mirror_partitions(mirror_dir):
+    # The dashboard's partitioned mirror when it is current, read one cohort at a
+    # time; otherwise the full mirror, split here.
+    root = os.path.join(mirror_dir, "cohorts")
+    index_path = os.path.join(root, "index.json")
+    history = os.path.join(mirror_dir, f"{pipeline.SHEET_NAME}.parquet")
+    if os.path.exists(index_path) and (not os.path.exists(history) or os.path.getmtime(index_path) >= os.path.getmtime(history)):
+        partitions = {
+            cohort: (meta["digest"], functools.partial(pipeline.read_partition, root, meta))
+            for cohort, meta in pipeline.read_partition_index(root).items()
+        }
+        return partitions, os.path.getmtime(index_path)
+    frames = []
+    for name in [pipeline.SHEET_NAME, pipeline.WEEKLY_SHEET_NAME]:
+        path = os.path.join(mirror_dir, f"{name}.parquet")
+        frames.append(pd.read_parquet(path) if os.path.exists(path) else pd.DataFrame())
+    synced_at = os.path.getmtime(history) if os.path.exists(history) else None
+    return split_partitions(*frames), synced_at
+
+def load_credentials(path):
+    if path:
+        with open(path) as f:
+            return json.load(f)
+    # Same service account the dashboard reads from Streamlit secrets. toml comes
+    # with Streamlit; only this path needs it.
+    import toml
+    return dict(toml.load(SECRETS_PATH)["gcp_service_account"])
+
+def load_sheets(credentials):
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(credentials, pipeline.scope)
+    ss = gspread.authorize(creds).open_by_key(pipeline.SHEET_ID)
+    history = pd.DataFrame(ss.worksheet(pipeline.SHEET_NAME).get_all_records())
+    try:
+        weekly = pd.DataFrame(ss.worksheet(pipeline.WEEKLY_SHEET_NAME).get_all_records())
+    except gspread.exceptions.WorksheetNotFound:
+        # The dashboard runs without Engagement_Weekly too.
+        weekly = pd.DataFrame()
+    return split_partitions(history, weekly), time.time()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute the dashboard's metrics into a versioned artifact.")
+    parser.add_argument("--sheets", action="store_true", help="read Google Sheets instead of the local mirror")
+    parser.add_argument("--credentials", help=f"service account JSON (default: gcp_service_account in {SECRETS_PATH})")
+    parser.add_argument("--mirror", default=MIRROR_DIR, help="mirror folder to read (default: %(default)s)")
+    parser.add_argument("--out", default=ARTIFACT_DIR, help="artifact folder (default: %(default)s)")
+    parser.add_argument("--cohort", action="append", help="only this cohort (repeatable; default: all)")
+    parser.add_argument("--keep", type=int, default=3, help="artifact versions to keep")
+    args = parser.parse_args(argv)
+
+    if args.sheets:
+        partitions, synced_at = load_sheets(load_credentials(args.credentials))
+        source = f"sheets:{pipeline.SHEET_ID}"
+    else:
+        partitions, synced_at = mirror_partitions(args.mirror)
+        source = f"mirror:{os.path.abspath(args.mirror)}"
+    if not partitions:
+        print(f"No History data found ({source}).", file=sys.stderr)
+        return 1
+    unknown = [c for c in args.cohort or [] if c not in partitions]
+    if unknown:
+        print(f"Unknown cohort(s): {', '.join(unknown)}. Available: {', '.join(sorted(partitions))}", file=sys.stderr)
+        return 1
+    for cohort in args.cohort or sorted(partitions):
+        started = time.perf_counter()
+        digest, load = partitions[cohort]
+        raw, raw_weekly = load()
+        if 'Date' not in raw.columns:
+            print(f"{cohort}: History has no Date column, skipped.", file=sys.stderr)
+            continue
+        loaded = time.perf_counter()
+        df, weekly, version = pipeline.prepare_frames(raw, raw_weekly)
+        tables = pipeline.precompute(df)
+        computed = time.perf_counter()
+        path = pipeline.write_artifact(args.out, cohort, df, weekly, version, tables, source, digest, synced_at, keep=args.keep)
+        print(
+            f"{cohort}: {path}, {len(df):,} rows, {df['StudentID'].nunique():,} students "
+            f"(load {loaded - started:.1f}s, compute {computed - loaded:.1f}s, write {time.perf_counter() - computed:.1f}s)"
+        )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 import streamlit as st
 import gspread
+from gspread.utils import absolute_range_name, numericise_all, rowcol_to_a1
 from oauth2client.service_account import ServiceAccountCredentials
 import pandas as pd
 import numpy as np
@@ -7,26 +8,137 @@ from datetime import datetime
 import plotly.express as px
 import plotly.graph_objects as go
 import urllib.parse
+import html
 import re
 import math
 import json
+import threading
+import time
+import os
+import hashlib
+import pyarrow as pa
+import pyarrow.parquet as pq
+import functools
+import contextlib
+import logging
+import uuid
+from collections import OrderedDict
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import pipeline
+from pipeline import (
+    SHEET_ID, SHEET_NAME, WEEKLY_SHEET_NAME, scope,
+    GROWTH_DAYS, METRICS, parse_number, parse_numbers, prepare_frames,
+    date_window, metric_frame, rank_students, search_students,
+)
 
-GROWTH_DAYS = 7
 st.set_page_config("VVC Social Dashboard", layout="wide", initial_sidebar_state="expanded")
 
-def parse_number(val):
-    if pd.isna(val) or str(val).strip().lower() in ["", "none", "n/a"]:
-        return 0.0
-    val = str(val).replace(",", "").strip().upper()
+# ---- Performance panel ----
+# Opt in with ?perf=1 or `perf_panel = true` in secrets; the opt-in sticks for the
+# session and rides along on Creators card clicks. Stage timings, Sheets API
+# calls, cache hits/misses and bytes sent to the browser are shown in a panel at
+# the bottom of the page and logged as one JSON object per line to "vvc.perf".
+# The API and cache counters are process-wide and always count (an integer bump
+# under a lock); the opt-in only decides whether a session shows and logs them.
+def perf_enabled():
+    if st.session_state.get("perf_opt_in"):
+        return True
+    if st.query_params.get("perf", "").lower() in ["1", "true", "yes"]:
+        st.session_state["perf_opt_in"] = True
+        return True
     try:
-        if val.endswith("K"):
-            return float(val[:-1]) * 1000
-        elif val.endswith("M"):
-            return float(val[:-1]) * 1000000
-        else:
-            return float(val)
-    except:
-        return 0.0
+        return bool(st.secrets.get("perf_panel", False))
+    except Exception:
+        return False
+
+@st.cache_resource
+def perf_counters():
+    # Process-wide: shared by every session and the background refresher.
+    return {"lock": threading.Lock(), "api_calls": 0, "caches": {}, "fetch_ms": None, "partition_ms": None}
+
+def perf_api_call():
+    counters = perf_counters()
+    with counters["lock"]:
+        counters["api_calls"] += 1
+
+def perf_cache(name, miss=False):
+    counters = perf_counters()
+    with counters["lock"]:
+        entry = counters["caches"].setdefault(name, {"calls": 0, "misses": 0})
+        entry["misses" if miss else "calls"] += 1
+
+def tracked(name, cache):
+    # Wraps an st.cache_* decorator so calls and actual body runs (misses) are counted.
+    def decorate(fn):
+        @functools.wraps(fn)
+        def body(*args, **kwargs):
+            perf_cache(name, miss=True)
+            return fn(*args, **kwargs)
+        cached = cache(body)
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            perf_cache(name)
+            return cached(*args, **kwargs)
+        call.clear = cached.clear
+        return call
+    return decorate
+
+@st.cache_resource
+def perf_logger():
+    logger = logging.getLogger("vvc.perf")
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+def perf_log(event, **fields):
+    if PERF_ON:
+        record = {"event": event, "session": st.session_state["_perf"]["session"], "ts": round(time.time(), 3)}
+        perf_logger().info(json.dumps({**record, **fields}, default=str))
+
+def _perf_record(stage, ms):
+    if PERF_ON:
+        st.session_state["_perf"]["stages"][stage] = ms
+        perf_log("stage", stage=stage, ms=round(ms, 2))
+
+@contextlib.contextmanager
+def perf_stage(stage):
+    # Also usable as a decorator; fragment reruns then update their own row.
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _perf_record(stage, (time.perf_counter() - start) * 1000)
+
+def perf_laps():
+    # lap(name) records the time since the previous lap, for straight-line script sections.
+    last = [time.perf_counter()]
+    def lap(stage):
+        now = time.perf_counter()
+        _perf_record(stage, (now - last[0]) * 1000)
+        last[0] = now
+    return lap
+
+def _count_payload(record):
+    # Every delta for this session goes through ctx.enqueue; sum their serialized sizes.
+    ctx = get_script_run_ctx()
+    if ctx is None or getattr(ctx.enqueue, "perf_counted", False):
+        return
+    enqueue = ctx.enqueue
+    def counted(msg):
+        record["bytes"] += msg.ByteSize()
+        enqueue(msg)
+    counted.perf_counted = True
+    ctx.enqueue = counted
+
+PERF_ON = perf_enabled()
+if PERF_ON:
+    perf_state = st.session_state.setdefault("_perf", {"session": uuid.uuid4().hex[:8], "runs": 0, "stages": {}, "bytes": 0})
+    perf_state.update(runs=perf_state["runs"] + 1, bytes=0, started=time.perf_counter())
+    _count_payload(perf_state)
 
 def student_initials(name):
     if not name: return "👤"
@@ -72,8 +184,47 @@ def safe_int_from_row(row, key):
     except Exception:
         return 0
     
-def render_leaderboard_card(name, initials, metric_str, color, highlight, medal):
-    st.markdown(
+# ---- Rendered HTML cache ----
+# Feed cards and leaderboard rows are memoized by what they show (student, platform
+# and a hash of the values that go into the markup), in a process-wide LRU.
+HTML_CACHE_SIZE = 2048
+@st.cache_resource
+def html_cache():
+    return {"entries": OrderedDict(), "lock": threading.Lock()}
+
+def content_hash(*values):
+    return hashlib.sha1(repr(values).encode()).hexdigest()
+
+def memo_html(key, build):
+    cache = html_cache()
+    perf_cache("html")
+    with cache["lock"]:
+        if key in cache["entries"]:
+            cache["entries"].move_to_end(key)
+            return cache["entries"][key]
+    perf_cache("html", miss=True)
+    html = build()
+    with cache["lock"]:
+        cache["entries"][key] = html
+        while len(cache["entries"]) > HTML_CACHE_SIZE:
+            cache["entries"].popitem(last=False)
+    return html
+
+@functools.lru_cache(maxsize=4096)
+def _post_timestamp(date_val):
+    try:
+        return pd.to_datetime(date_val)
+    except Exception:
+        return pd.NaT
+
+def post_is_new(date_val):
+    try:
+        return bool(_post_timestamp(date_val) > (pd.Timestamp.now() - pd.Timedelta(days=7)))
+    except Exception:
+        return False
+
+def leaderboard_card_html(name, initials, metric_str, color, highlight, medal):
+    return (
 f"""
 <div style="display:flex;align-items:center;gap:13px;padding:7px 9px 7px 0;margin-bottom:5px;{highlight}">
     {medal}
@@ -82,10 +233,33 @@ f"""
     <span style="font-weight:700;flex:1">{name}</span>
     <span style='font-weight:900;color:{color};font-size:1.1em;'>{metric_str}</span>
 </div>
-""",
-        unsafe_allow_html=True
+"""
     )
 
+# ---- Rankings ----
+MEDALS = [
+    '<span style="font-size:1.15em;color:#e1b400;margin-right:3px;">🥇</span>',
+    '<span style="font-size:1.15em;color:#bbb;margin-right:3px;">🥈</span>',
+    '<span style="font-size:1.15em;color:#cd7f32;margin-right:3px;">🥉</span>',
+]
+
+def leaderboard_html(ranked, value_col, metric, color, selected):
+    # All leaderboard rows as one markdown payload, so a rerun sends a single element.
+    rows = []
+    for rank, (name, val) in enumerate(zip(ranked['Name'], ranked[value_col])):
+        highlight = (
+            "background:linear-gradient(97deg,#fcb69f33 60%,#a1c4fd13 100%);border-radius:13px;"
+            if name == selected else ""
+        )
+        if metric in ["Followers", "Follower Growth"]:
+            metric_str = f"{int(round(val)):,}" if val else "0"
+        else:
+            metric_str = f"{val:.1f}%"
+        medal = MEDALS[rank] if rank < len(MEDALS) else f'<span style="width:18px;display:inline-block;">{rank+1}</span>'
+        args = (name, student_initials(name), metric_str, color, highlight, medal)
+        rows.append(memo_html(("leaderboard", name, content_hash(*args)), lambda: leaderboard_card_html(*args)))
+    return '<div style="margin-top:.7em;">' + "".join(rows) + "</div>"
+
 # ---- Banner ----
 st.markdown("""
 <div style='
@@ -108,46 +282,533 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# ---- Google Sheets ----
-SHEET_ID = '1MvGIdmM9eW89vSIoMzlg6k8x6oXBr1XKfrCoLIBkzq0'
-SHEET_NAME = 'History'
-scope = [
-    'https://spreadsheets.google.com/feeds',
-    'https://www.googleapis.com/auth/drive'
-]
-
-creds_dict = st.secrets["gcp_service_account"]
-creds = ServiceAccountCredentials.from_json_keyfile_dict(dict(creds_dict), scope)
+# ---- Local mirror ----
+# Parquet copies of History and Engagement_Weekly, refreshed after every sync.
+# A cold start reads them instead of waiting on the Sheets API, and VVC_OFFLINE=1
+# runs the whole dashboard from them (or from any files dropped in VVC_MIRROR_DIR).
+MIRROR_DIR = os.environ.get("VVC_MIRROR_DIR", ".mirror")
+OFFLINE = os.environ.get("VVC_OFFLINE", "").lower() in ["1", "true", "yes"]
+DATA_TTL = 300
+
+def mirror_path(name):
+    return os.path.join(MIRROR_DIR, f"{name}.parquet")
+
+def read_mirror(name):
+    path = mirror_path(name)
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    return pd.read_parquet(path)
+
+def mirror_age(name):
+    path = mirror_path(name)
+    return time.time() - os.path.getmtime(path) if os.path.exists(path) else None
+
+def _typed_for_mirror(frame):
+    # Sheet columns mixing numbers and text ("1.2K", blanks) can't be stored as one
+    # Parquet type, so those are kept as text; clean columns keep their real dtype.
+    out = frame.copy()
+    for col in out.columns:
+        if pd.api.types.infer_dtype(out[col], skipna=False) not in ["integer", "floating", "string", "empty"]:
+            out[col] = out[col].astype(str)
+    return out
+
+@st.cache_resource
+def mirror_hashes():
+    return {}
+
+def update_mirror(name, frame, hashes=None):
+    # hashes: the frame's pipeline.row_hashes(), when the caller already has them.
+    digest = pipeline.frame_digest(frame, hashes)
+    if mirror_hashes().get(name) == digest and os.path.exists(mirror_path(name)):
+        return
+    try:
+        os.makedirs(MIRROR_DIR, exist_ok=True)
+        tmp = mirror_path(name) + ".tmp"
+        _typed_for_mirror(frame).to_parquet(tmp, index=False)
+        os.replace(tmp, mirror_path(name))
+        mirror_hashes()[name] = digest
+    except Exception:
+        # The mirror is only a cache; a read-only disk shouldn't take the page down.
+        pass
 
+# ---- Precomputed artifact ----
+# Written by precompute.py, one per cohort. When a cohort's artifact was built from
+# the exact partition being served, its frames are used as-is and the cached
+# helpers return its tables, so that version's metrics are never computed in the app.
+ARTIFACT_DIR = os.environ.get("VVC_ARTIFACT_DIR", os.path.join(MIRROR_DIR, "artifacts"))
 
-client = gspread.authorize(creds)
-sheet = client.open_by_key(SHEET_ID).worksheet(SHEET_NAME)
+def load_artifact(cohort, digest):
+    try:
+        return pipeline.read_artifact(ARTIFACT_DIR, cohort, digest)
+    except Exception:
+        # A missing or half-written artifact just means computing as usual.
+        return None
+
+def precomputed(version):
+    for prep in list(prepared_cohorts()["frames"].values()):
+        if prep["artifact"] is not None and prep["artifact"]["version"] == version:
+            return prep["artifact"]
+    return None
+
+# ---- Exports ----
+# Download files are only written when a download button is clicked, in
+# EXPORT_CHUNK_ROWS pieces, and kept on disk by key so repeat downloads of the
+# same view are a file read. Only the newest EXPORT_KEEP files are kept.
+# Streamlit still serves each download from one in-memory bytes object (its
+# deferred downloads take no generators), so a click holds one copy of the file.
+EXPORT_DIR = os.path.join(MIRROR_DIR, "exports")
+EXPORT_CHUNK_ROWS = 50000
+EXPORT_KEEP = 64
+EXPORT_MIME = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+def _write_export(frame, path, fmt):
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    if fmt == "csv":
+        with open(tmp, "w", newline="", encoding="utf-8") as fh:
+            for start in range(0, max(len(frame), 1), EXPORT_CHUNK_ROWS):
+                frame.iloc[start:start + EXPORT_CHUNK_ROWS].to_csv(fh, index=False, header=start == 0)
+    else:
+        table = pa.Table.from_pandas(pipeline.parquet_safe(frame), preserve_index=False)
+        with pq.ParquetWriter(tmp, table.schema) as writer:
+            for batch in table.to_batches(EXPORT_CHUNK_ROWS):
+                writer.write_batch(batch)
+    os.replace(tmp, path)
+
+def export_file(frame, key, fmt):
+    # key=None addresses the file by the frame's contents instead.
+    if key is None:
+        key = (list(frame.columns), pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+    path = os.path.join(EXPORT_DIR, f"{hashlib.sha1(repr(key).encode()).hexdigest()[:20]}.{fmt}")
+    if not os.path.exists(path):
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        _write_export(frame, path, fmt)
+        files = sorted((os.path.join(EXPORT_DIR, f) for f in os.listdir(EXPORT_DIR)), key=os.path.getmtime)
+        for old in files[:-EXPORT_KEEP]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+    with open(path, "rb") as fh:
+        return fh.read()
+
+def export_buttons(frame, key, label, file_stem):
+    # CSV and Parquet buttons; nothing is serialized until one of them is clicked.
+    for fmt, box in zip(["csv", "parquet"], st.columns(2)):
+        box.download_button(
+            f"⬇️ {label} as {'CSV' if fmt == 'csv' else 'Parquet'}",
+            lambda fmt=fmt: export_file(frame, key, fmt),
+            file_name=f"{file_stem}.{fmt}",
+            mime=EXPORT_MIME[fmt],
+        )
 
-# ---- Engagement Weekly Worksheet ----
-try:
-    sheet_weekly = client.open_by_key(SHEET_ID).worksheet("Engagement_Weekly")
-    df_weekly = pd.DataFrame(sheet_weekly.get_all_records())
-    df_weekly['Week'] = pd.to_datetime(df_weekly['Week'], errors='coerce')
-except Exception as e:
-    df_weekly = pd.DataFrame()
-    st.warning("Couldn't load Engagement_Weekly worksheet. Make sure it exists in your Google Sheet.")
-    # Immediately after you load df_weekly:
-for col in ["Videos_Posted", "Zoom_Calls_Attended", "Discord_Feedback_Requested", "Course_Completed_Percent"]:
-    if col in df_weekly.columns:
-        df_weekly[col] = pd.to_numeric(df_weekly[col], errors="coerce")
+# ---- Sheets client ----
+# One authorized client per process, shared by every session and rerun.
+@st.cache_resource
+def sheets_client():
+    creds_dict = st.secrets["gcp_service_account"]
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(dict(creds_dict), scope)
+    perf_api_call()
+    return gspread.authorize(creds)
+
+@st.cache_resource
+def spreadsheet():
+    client = sheets_client()
+    perf_api_call()
+    return client.open_by_key(SHEET_ID)
+
+# ---- Single-flight fetches ----
+# Sessions asking for the same ranges while a request for them is already out
+# wait for that request and share its result (or its error) instead of sending
+# their own. Counts are per worksheet set: requests sent vs. requests absorbed.
+@st.cache_resource
+def flights():
+    return {"lock": threading.Lock(), "calls": {}, "counts": {}}
+
+def single_flight(key, fn, label=None):
+    reg = flights()
+    with reg["lock"]:
+        counts = reg["counts"].setdefault(label or str(key), {"fetches": 0, "deduped": 0})
+        call = reg["calls"].get(key)
+        leader = call is None
+        if leader:
+            call = {"done": threading.Event(), "result": None, "error": None}
+            reg["calls"][key] = call
+            counts["fetches"] += 1
+        else:
+            counts["deduped"] += 1
+    if leader:
+        try:
+            call["result"] = fn()
+        except BaseException as e:
+            # Streamlit's rerun/stop exceptions too: waiters must not read a missing result.
+            call["error"] = e
+        finally:
+            with reg["lock"]:
+                del reg["calls"][key]
+            call["done"].set()
+    else:
+        call["done"].wait()
+    if call["error"] is not None:
+        raise call["error"]
+    return call["result"]
+
+def batch_values(ss, ranges):
+    def fetch():
+        perf_api_call()
+        resp = ss.values_batch_get(ranges)
+        return [vr.get("values", []) for vr in resp.get("valueRanges", [])]
+    sheets = ", ".join(dict.fromkeys(r.split("!")[0].strip("'") for r in ranges))
+    return single_flight(("values", tuple(ranges)), fetch, label=sheets)
+
+def _sheet_rows(values, width):
+    rows = []
+    for r in values:
+        r = list(r) + [""] * (width - len(r))
+        rows.append(numericise_all(r[:width]))
+    return rows
+
+def sheet_frame(values):
+    # Same shape as get_all_records(): first row is the header, numbers numericised.
+    if not values:
+        return pd.DataFrame()
+    return pd.DataFrame(_sheet_rows(values[1:], len(values[0])), columns=values[0])
+
+# ---- Incremental History sync ----
+# History is append-only, so after the first full pull we only fetch the rows past
+# the ones we already hold. The last held row is re-read alongside the new range:
+# if it (or the header) no longer matches, the sheet was edited in place and we
+# fall back to a full pull. Engagement_Weekly is small and rides along in the same
+# batched request.
+@st.cache_resource
+def sheet_sync_state():
+    state = {"header": None, "last_row": None, "df": pd.DataFrame(), "hashes": pd.Series(dtype="uint64"),
+             "weekly": read_mirror(WEEKLY_SHEET_NAME), "synced_at": None, "lock": threading.Lock()}
+    seeded = read_mirror(SHEET_NAME)
+    if not seeded.empty:
+        state.update(
+            header=list(seeded.columns),
+            last_row=seeded.iloc[-1].tolist(),
+            df=seeded,
+            hashes=pipeline.row_hashes(seeded),
+            synced_at=time.time() - mirror_age(SHEET_NAME),
+        )
+    return state
+
+def _row_key(row):
+    # Compares a fresh sheet row with a held one, which may have been typed by the mirror.
+    key = []
+    for v in row:
+        if v is None or v == "" or (isinstance(v, float) and math.isnan(v)):
+            key.append("")
+            continue
+        try:
+            key.append(repr(float(v)))
+        except (TypeError, ValueError):
+            key.append(str(v))
+    return key
+
+def _set_full_history(state, values):
+    frame = sheet_frame(values)
+    state.update(
+        header=list(values[0]) if values else None,
+        last_row=frame.iloc[-1].tolist() if not frame.empty else None,
+        df=frame,
+        hashes=pipeline.row_hashes(frame),
+    )
 
-@st.cache_data(ttl=300)
-def load_data():
-    return pd.DataFrame(sheet.get_all_records())
-df = load_data()
+def _fetch_with_weekly(ss, history_ranges):
+    # A missing Engagement_Weekly tab fails the whole batch, so retry without it.
+    try:
+        values = batch_values(ss, history_ranges + [absolute_range_name(WEEKLY_SHEET_NAME)])
+        return values[:-1], sheet_frame(values[-1])
+    except gspread.exceptions.APIError:
+        return batch_values(ss, history_ranges), pd.DataFrame()
+
+def sync_sheets(ss, state):
+    with state["lock"]:
+        state["synced_at"] = time.time()
+        held = len(state["df"])
+        if state["header"] is None or held == 0:
+            (history_vals,), weekly = _fetch_with_weekly(ss, [absolute_range_name(SHEET_NAME)])
+            _set_full_history(state, history_vals)
+        else:
+            header = state["header"]
+            last_col = rowcol_to_a1(1, len(header)).rstrip("0123456789")
+            # Row 1 is the header, so the last held row sits at sheet row held + 1.
+            (header_vals, tail_vals), weekly = _fetch_with_weekly(ss, [
+                absolute_range_name(SHEET_NAME, "1:1"),
+                absolute_range_name(SHEET_NAME, f"A{held + 1}:{last_col}"),
+            ])
+            current_header = list(header_vals[0]) if header_vals else []
+            tail = _sheet_rows(tail_vals, len(header))
+            if current_header != header or not tail or _row_key(tail[0]) != _row_key(state["last_row"]):
+                (history_vals,) = batch_values(ss, [absolute_range_name(SHEET_NAME)])
+                _set_full_history(state, history_vals)
+            elif len(tail) > 1:
+                new_rows = tail[1:]
+                frame = pd.concat([state["df"], pd.DataFrame(new_rows, columns=header)], ignore_index=True)
+                # Row hashes depend on column dtypes, so only new rows are hashed unless appending changed one.
+                if frame.dtypes.equals(state["df"].dtypes):
+                    hashes = pd.concat([state["hashes"], pipeline.row_hashes(frame.iloc[held:])])
+                else:
+                    hashes = pipeline.row_hashes(frame)
+                state.update(df=frame, hashes=hashes, last_row=new_rows[-1])
+        if not weekly.empty:
+            state["weekly"] = weekly
+        return state["df"], state["hashes"], state["weekly"]
+
+# ---- Latest snapshot index ----
+# Memoized per data version and window. The Creators list, leaderboard, Analytics
+# metrics and platform mix all read from it, so a rerun aggregates each window once.
+@tracked("latest_snapshot", st.cache_data(max_entries=64))
+def latest_snapshot(_df, version, start=None, end=None):
+    art = precomputed(version)
+    if art is not None and start is not None:
+        # The artifact holds the snapshot over every dated row, which any window
+        # reaching both ends of the history selects.
+        dates = _df['Date'].dropna()
+        if pd.Timestamp(start) <= dates.min() and pd.Timestamp(end) >= dates.max():
+            return art["snapshot"]
+    return pipeline.latest_snapshot(_df, start, end)
+
+def snapshot_between(start, end):
+    if start is None:
+        return latest_snapshot(df, data_version)
+    return latest_snapshot(df, data_version, str(pd.Timestamp(start)), str(pd.Timestamp(end)))
+
+# ---- Date-range index ----
+# Built once per data version; growth for any window reads its ends from it.
+@tracked("history_index", st.cache_resource(max_entries=2))
+def history_index(_df, version):
+    return pipeline.history_index(_df)
+
+# ---- Cohort partitions ----
+# Each sync is split by cohort (see pipeline.split_cohorts). A partition is just a
+# digest, a small summary and a way to load its rows; it is only normalized when a
+# session opens that cohort, and the last few prepared cohorts are kept. Changed
+# partitions are summarized in the refresher and written to the partitioned mirror,
+# whose summaries a restart reuses; offline mode loads single partitions from it.
+COHORT_DIR = os.path.join(MIRROR_DIR, "cohorts")
+PREPARED_COHORTS = 4
+
+@st.cache_resource
+def prepared_cohorts():
+    return {"lock": threading.Lock(), "frames": OrderedDict()}
+
+def _remember_prepared(key, prep):
+    registry = prepared_cohorts()
+    with registry["lock"]:
+        registry["frames"][key] = prep
+        registry["frames"].move_to_end(key)
+        while len(registry["frames"]) > PREPARED_COHORTS:
+            registry["frames"].popitem(last=False)
+
+def _partition_rows(raw, raw_weekly, rows, weekly_rows):
+    if rows is None:
+        return raw, raw_weekly
+    return raw.loc[rows], raw_weekly.loc[weekly_rows]
+
+def build_partitions(raw, raw_weekly, previous, hashes=None, weekly_hashes=None):
+    # Each sheet is hashed once (or not at all, given its row hashes); cohorts slice them.
+    hashes = pipeline.row_hashes(raw) if hashes is None else hashes
+    weekly_hashes = pipeline.row_hashes(raw_weekly) if weekly_hashes is None else weekly_hashes
+    disk = pipeline.read_partition_index(COHORT_DIR)
+    parts, written = {}, False
+    for cohort, (rows, weekly) in pipeline.split_cohorts(raw, raw_weekly).items():
+        digest = pipeline.partition_digest(rows, weekly, hashes, weekly_hashes)
+        # Rows are re-sliced from the latest sync on load, so no entry pins an old frame.
+        if rows is raw:
+            load = functools.partial(_partition_rows, raw, raw_weekly, None, None)
+        else:
+            load = functools.partial(_partition_rows, raw, raw_weekly, rows.index, weekly.index)
+        old = previous.get(cohort)
+        if old is not None and old["digest"] == digest:
+            parts[cohort] = {**old, "load": load}
+            continue
+        if cohort in disk and disk[cohort]["digest"] == digest:
+            parts[cohort] = {"digest": digest, "summary": pipeline.read_summary(COHORT_DIR, disk[cohort]), "load": load}
+            continue
+        frames = prepare_frames(rows, weekly)
+        summary = pipeline.cohort_summary(frames[0], frames[1])
+        if old is not None and (cohort, old["digest"]) in prepared_cohorts()["frames"]:
+            # Someone is viewing this cohort: hand them the new data already prepared.
+            _remember_prepared((cohort, digest), {"frames": frames, "artifact": None})
+        try:
+            disk[cohort] = pipeline.write_partition(COHORT_DIR, cohort, rows, weekly, digest, summary)
+            written = True
+        except Exception:
+            pass
+        parts[cohort] = {"digest": digest, "summary": summary, "load": load}
+    if written or set(disk) != set(parts):
+        try:
+            pipeline.write_partition_index(COHORT_DIR, {c: disk[c] for c in parts if c in disk})
+        except Exception:
+            pass
+    return parts
+
+def offline_partitions(previous):
+    index_path = os.path.join(COHORT_DIR, "index.json")
+    age = mirror_age(SHEET_NAME)
+    if not os.path.exists(index_path) or (age is not None and time.time() - age > os.path.getmtime(index_path)):
+        # No partitioned mirror yet, or a newer History.parquet was dropped in: split it.
+        parts = build_partitions(read_mirror(SHEET_NAME), read_mirror(WEEKLY_SHEET_NAME), previous)
+        try:
+            os.utime(index_path)
+        except OSError:
+            pass
+        return parts
+    parts = {}
+    for cohort, meta in pipeline.read_partition_index(COHORT_DIR).items():
+        old = previous.get(cohort)
+        if old is not None and old["digest"] == meta["digest"]:
+            parts[cohort] = old
+            continue
+        parts[cohort] = {"digest": meta["digest"], "summary": pipeline.read_summary(COHORT_DIR, meta),
+                         "load": functools.partial(pipeline.read_partition, COHORT_DIR, meta)}
+    return parts
+
+def _prepare_cohort(cohort, entry):
+    key = (cohort, entry["digest"])
+    prep = prepared_cohorts()["frames"].get(key)
+    if prep is None:
+        art = load_artifact(cohort, entry["digest"])
+        if art is not None:
+            prep = {"frames": (art["df"], art["weekly"], art["version"]), "artifact": art}
+        else:
+            with perf_stage("Normalize cohort"):
+                prep = {"frames": prepare_frames(*entry["load"]()), "artifact": None}
+    _remember_prepared(key, prep)
+    return prep["frames"]
+
+def cohort_frames(partitions, cohort):
+    # (df, df_weekly, data_version) for one cohort; sessions opening it together share one pass.
+    entry = partitions[cohort]
+    key = (cohort, entry["digest"])
+    prep = prepared_cohorts()["frames"].get(key)
+    if prep is not None:
+        # Already in memory: no load, so nothing for the flight counters to record.
+        _remember_prepared(key, prep)
+        return prep["frames"]
+    return single_flight(("cohort", cohort, entry["digest"]), lambda: _prepare_cohort(cohort, entry), label="cohort")
+
+def cohort_order(partitions):
+    # Most recent cohort first; rows without a cohort come last even if still scraped daily.
+    return sorted(
+        partitions,
+        key=lambda c: (c != pipeline.UNASSIGNED_COHORT, partitions[c]["summary"]["overview"]["last_date"] or "", c),
+        reverse=True,
+    )
 
-# --- CLEAN ALL NUMERIC COLUMNS ---
-numeric_cols = [col for col in df.columns if any(x in col.lower() for x in ["followers", "likes", "comments"])]
-for col in numeric_cols:
-    df[col] = pd.to_numeric(df[col].replace(["", " ", None, "none", "n/a", "N/A"], np.nan), errors="coerce")
+# ---- Background refresh ----
+# Sessions always render the last synced partitions. A worker thread re-syncs the
+# sheets every DATA_TTL seconds and swaps the new partitions in as one dict, so no
+# visitor waits on Google once a snapshot exists (the mirror provides one after a
+# restart). A failed refresh is recorded and shown; the previous snapshot stays up.
+# synced_at is when the data was last pulled from Google (offline: when the mirror
+# was written); checked_at is when the worker last refreshed.
+REFRESH_RETRY = 60
+
+@st.cache_resource
+def data_store():
+    return {"partitions": None, "synced_at": None, "checked_at": None, "error": None, "failed_at": None,
+            "worker": None, "lock": threading.Lock()}
+
+def offline_synced_at():
+    # Offline data is as old as the mirror it came from.
+    for path in [mirror_path(SHEET_NAME), os.path.join(COHORT_DIR, "index.json")]:
+        if os.path.exists(path):
+            return os.path.getmtime(path)
+    return time.time()
+
+def refresh_data(store, ss, state):
+    try:
+        started = time.perf_counter()
+        if OFFLINE:
+            fetched = started
+            partitions = offline_partitions(store["partitions"] or {})
+            synced_at = offline_synced_at()
+        else:
+            frame, hashes, weekly = sync_sheets(ss, state)
+            fetched = time.perf_counter()
+            weekly_hashes = pipeline.row_hashes(weekly)
+            update_mirror(SHEET_NAME, frame, hashes)
+            update_mirror(WEEKLY_SHEET_NAME, weekly, weekly_hashes)
+            partitions = build_partitions(frame, weekly, store["partitions"] or {}, hashes, weekly_hashes)
+            synced_at = time.time()
+        perf_counters().update(fetch_ms=round((fetched - started) * 1000, 2), partition_ms=round((time.perf_counter() - fetched) * 1000, 2))
+    except Exception as e:
+        store.update(error=f"{type(e).__name__}: {e}", failed_at=time.time())
+        return
+    store.update(partitions=partitions, synced_at=synced_at, checked_at=time.time(), error=None, failed_at=None)
+
+def _refresh_loop(store, ss, state):
+    while True:
+        if store["error"]:
+            due = store["failed_at"] + REFRESH_RETRY
+        else:
+            # A snapshot seeded from the mirror has no checked_at yet, so a stale one refreshes right away.
+            due = (store["checked_at"] or store["synced_at"]) + DATA_TTL
+        time.sleep(max(due - time.time(), 1))
+        refresh_data(store, ss, state)
+
+def _first_snapshot(store, ss, state):
+    if store["partitions"] is not None:
+        return
+    if state is not None and not state["df"].empty:
+        # Seeded from the mirror: serve it now, the worker catches up right away if stale.
+        store.update(partitions=build_partitions(state["df"], state["weekly"], {}, state["hashes"]), synced_at=state["synced_at"])
+    else:
+        refresh_data(store, ss, state)
+
+def current_data():
+    store = data_store()
+    ss = state = None
+    if not OFFLINE:
+        ss, state = spreadsheet(), sheet_sync_state()
+    if store["partitions"] is None:
+        # Visitors arriving together on a cold process share one first load.
+        single_flight("first-snapshot", lambda: _first_snapshot(store, ss, state))
+    with store["lock"]:
+        worker = store["worker"]
+        if store["partitions"] is not None and (worker is None or not worker.is_alive()):
+            worker = threading.Thread(target=_refresh_loop, args=(store, ss, state), name="sheet-refresher", daemon=True)
+            worker.start()
+            store["worker"] = worker
+    return store
+
+def format_age(seconds):
+    minutes = int(seconds // 60)
+    if minutes < 1:
+        return "just now"
+    if minutes < 60:
+        return f"{minutes} min ago"
+    return f"{minutes // 60} h {minutes % 60} min ago"
+
+store = current_data()
+if store["partitions"] is None:
+    st.error(f"Couldn't load the Google Sheet: {store['error']}")
+    st.stop()
+partitions = store["partitions"]
+if not partitions:
+    st.error(f"No History data available. Offline mode needs a mirror at {mirror_path(SHEET_NAME)}." if OFFLINE else "No History data available.")
+    st.stop()
+cohorts = cohort_order(partitions)
+if len(cohorts) > 1:
+    if st.session_state.get("cohort") not in cohorts:
+        st.session_state["cohort"] = st.query_params.get("cohort") if st.query_params.get("cohort") in cohorts else cohorts[0]
+    cohort = st.selectbox("Cohort", cohorts, key="cohort")
+    # In the URL too, so reloads, shared links and Creators card clicks stay in this cohort.
+    st.query_params["cohort"] = cohort
+else:
+    cohort = cohorts[0]
+df, df_weekly, data_version = cohort_frames(partitions, cohort)
+st.caption(f"Data updated {format_age(time.time() - store['synced_at'])}")
+if store["error"]:
+    st.warning(f"Last refresh failed {format_age(time.time() - store['failed_at'])} ({store['error']}). Showing the previous data; retrying in the background.")
 
-df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-df = df.sort_values("Date").drop_duplicates(subset=["StudentID", "Date"], keep="last")
+# ---- Engagement Weekly Worksheet ----
+if df_weekly.empty:
+    st.warning("Couldn't load Engagement_Weekly worksheet. Make sure it exists in your Google Sheet.")
 
 PLATFORMS = [
     {"label": "Instagram", "user": "IG_Username", "foll": "IG_Followers", "foll_last": "IG_Followers_Last", "emoji": "https://cdn.jsdelivr.net/gh/simple-icons/simple-icons/icons/instagram.svg", "brand": "linear-gradient(90deg,#fcb69f 10%,#a1c4fd 90%)", "prefix": "IG"},
@@ -157,7 +818,38 @@ PLATFORMS = [
     {"label": "LinkedIn", "user": "LI_Username", "foll": "LI_Followers", "foll_last": "LI_Followers_Last", "emoji": "https://cdn.jsdelivr.net/gh/simple-icons/simple-icons/icons/linkedin.svg", "brand": "#1378b4", "display": "#126BC4", "prefix": "LI"},
 ]
 
-menu_tabs = st.tabs(["Dashboard", "Analytics"])
+# ---- Follower growth table ----
+# Student x platform growth over GROWTH_DAYS, built once per data version.
+@tracked("growth_table", st.cache_data(max_entries=4))
+def growth_table(_df, version, prefixes, days=GROWTH_DAYS):
+    art = precomputed(version)
+    if art is not None and art["prefixes"] == list(prefixes) and art["growth_days"] == days:
+        return art["growth"]
+    return pipeline.growth_table(_df, prefixes, days)
+
+growth = growth_table(df, data_version, [p['prefix'] for p in PLATFORMS])
+
+# ---- Leaderboard metrics ----
+@tracked("leaderboard_cube", st.cache_resource(max_entries=2))
+def leaderboard_cube(_df, version):
+    # Built once per data version so flipping the leaderboard selectboxes is a dict lookup.
+    prefixes = [p['prefix'] for p in PLATFORMS]
+    art = precomputed(version)
+    if art is not None and art["prefixes"] == prefixes:
+        return art["leaderboard"]
+    dates = _df['Date'].dropna()
+    snap = latest_snapshot(_df, version, str(dates.min()), str(dates.max()))
+    return pipeline.leaderboard_cube(snap, history_index(_df, version), prefixes)
+
+def covers_history(start, end):
+    # True when a date-range pick includes every dated History row.
+    if start is None:
+        return True
+    dates = df['Date'].dropna()
+    return pd.Timestamp(start) <= dates.min() and pd.Timestamp(end) >= dates.max()
+
+# Tab state is tracked so the Analytics and Cohorts tabs only compute and render while open.
+menu_tabs = st.tabs(["Dashboard", "Analytics"] + (["Cohorts"] if len(cohorts) > 1 else []), key="view", on_change="rerun")
 
 # ---- QUICK STATS BANNER ----
 if not df_weekly.empty:
@@ -187,36 +879,50 @@ if not df_weekly.empty:
 
 with menu_tabs[0]:
     if 'Date' in df.columns:
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
         latest_date = df['Date'].max()
-        curr_df = df[df['Date'] == latest_date].copy()
+        curr_df = snapshot_between(df['Date'].min(), latest_date)
+        curr_df = curr_df[curr_df['Date'] == latest_date]
     else:
         curr_df = df.copy()
 
     lcol, ccol, rcol = st.columns([1.2, 2.2, 1.2], gap="large")
 
-def get_primary_platform_emoji(name, curr_df, PLATFORMS):
-    # Returns the emoji/icon for the platform where the student has the most followers
-    if name not in curr_df['Name'].values:
-        return ""
-    row = curr_df[curr_df['Name'] == name]
-    max_count = -1
-    icon = ""
-    for p in PLATFORMS:
-        try:
-            if p['foll'] in row:
-                val = parse_number(row.iloc[0][p['foll']])
-                if val > max_count:
-                    max_count = val
-                    icon = p['emoji']
-        except Exception:
-            continue
-    return icon
-
+def primary_platforms(frame):
+    # Platform with the most followers per row (first wins on ties, "" if none parse).
+    plats = [p for p in PLATFORMS if p['foll'] in frame.columns]
+    if not plats or frame.empty:
+        return pd.Series("", index=frame.index, dtype=object)
+    foll = np.column_stack([parse_numbers(frame[p['foll']]).values for p in plats])
+    foll = np.where(foll > -1, foll, -np.inf)
+    labels = np.array([p['label'] for p in plats], dtype=object)[foll.argmax(axis=1)]
+    return pd.Series(np.where(np.isfinite(foll.max(axis=1)), labels, ""), index=frame.index, dtype=object)
+
+PLATFORM_ICONS = {p['label']: p['emoji'] for p in PLATFORMS}
+CREATORS_PAGE_SIZE = 30
+
+def turn_creators_page(step, n_pages):
+    # Button callback: runs before the rerun, so the list renders the new page.
+    page = st.session_state.get("creators_page", 0) + step
+    st.session_state.creators_page = min(max(page, 0), n_pages - 1)
+
+curr_df['Primary_Platform'] = primary_platforms(curr_df)
+
+# ---- Creator search ----
+# Trigram index over the current snapshot, built once per data version.
+@tracked("search_index", st.cache_resource(max_entries=4))
+def search_index(_snapshot, version):
+    return pipeline.search_index(_snapshot)
+
+lap = perf_laps()
 with lcol:
     st.markdown("#### Creators")
     search = st.text_input("Type to search…", key="sidebar_search")
-    fdf = curr_df[curr_df['Name'].str.contains(search, case=False, na=False)] if search else curr_df
+    list_platform = st.selectbox("Main platform", ["All platforms"] + [p['label'] for p in PLATFORMS], key="sidebar_platform")
+    fdf = curr_df.iloc[search_students(search_index(curr_df, data_version), search)] if search else curr_df
+    if list_platform != "All platforms":
+        fdf = fdf[fdf['Primary_Platform'] == list_platform]
+    first_rows = curr_df.drop_duplicates('Name')
+    primary_icons = dict(zip(first_rows['Name'], first_rows['Primary_Platform'].map(PLATFORM_ICONS).fillna("")))
     student_names = [n for n in fdf['Name'].tolist() if str(n).strip()]
     master_student_names = [n for n in curr_df['Name'].tolist() if str(n).strip()]
     if not student_names:
@@ -226,6 +932,29 @@ with lcol:
     if ('selected_student' not in st.session_state or
         st.session_state.selected_student not in student_names):
         st.session_state.selected_student = student_names[0]
+    query_params = st.query_params
+    if "student" in query_params:
+        clicked_name = urllib.parse.unquote(query_params["student"])
+        if clicked_name in student_names:
+            st.session_state.selected_student = clicked_name
+        del st.query_params["student"]
+
+    # ---- Creators list window ----
+    # Only one page of cards is sent to the browser. The page follows the
+    # selection whenever it changes and otherwise stays where the ◀ ▶ buttons put it.
+    n_pages = max(1, math.ceil(len(student_names) / CREATORS_PAGE_SIZE))
+    if st.session_state.get("creators_page_for") != st.session_state.selected_student:
+        st.session_state.creators_page_for = st.session_state.selected_student
+        st.session_state.creators_page = student_names.index(st.session_state.selected_student) // CREATORS_PAGE_SIZE
+    page = min(max(st.session_state.get("creators_page", 0), 0), n_pages - 1)
+    st.session_state.creators_page = page
+    page_start = page * CREATORS_PAGE_SIZE
+    page_end = min(page_start + CREATORS_PAGE_SIZE, len(student_names))
+    if n_pages > 1:
+        prev_col, info_col, next_col = st.columns([1, 2, 1])
+        prev_col.button("◀", key="creators_prev", disabled=page == 0, on_click=turn_creators_page, args=(-1, n_pages))
+        next_col.button("▶", key="creators_next", disabled=page >= n_pages - 1, on_click=turn_creators_page, args=(1, n_pages))
+        info_col.caption(f"{page_start + 1}–{page_end} of {len(student_names)}")
 
     st.markdown("""
     <style>
@@ -266,17 +995,23 @@ with lcol:
     <div class="student-scroll-list">
     """, unsafe_allow_html=True)
 
+    # A card click loads a fresh page, so anything the next session needs goes in the form.
+    form_params = '<input type="hidden" name="perf" value="1">' if PERF_ON else ""
+    if len(cohorts) > 1:
+        form_params += f'<input type="hidden" name="cohort" value="{html.escape(cohort)}">'
     student_html = ""
-    for i, n in enumerate(student_names):
+    for i in range(page_start, page_end):
+        n = student_names[i]
         initials = student_initials(n)
         selected = (n == st.session_state.selected_student)
         card_class = "student-card2 selected" if selected else "student-card2"
         # Platform icon for their main platform (emoji, no badge)
-        icon_url = get_primary_platform_emoji(n, curr_df, PLATFORMS)
+        icon_url = primary_icons.get(n, "")
         primary_platform = f"<img src='{icon_url}' width='26' height='26' style='vertical-align:middle;margin-left:3px;border-radius:7px;'/>" if icon_url else ""
 
         student_html += f"""
         <form action="#student_{i}" method="get" class="student-btn-form">
+            {form_params}
             <button name="student" value="{n}" type="submit" style="all:unset;width:100%;">
                 <div class="{card_class}" id="student_{i}">
                     <div class="student-initials2">{initials}</div>
@@ -290,18 +1025,168 @@ with lcol:
         """
 
     st.markdown(student_html + "</div>", unsafe_allow_html=True)
-    query_params = st.query_params
-    if "student" in query_params:
-        clicked_name = urllib.parse.unquote(query_params["student"])
-        if clicked_name in student_names:
-            st.session_state.selected_student = clicked_name
-        st.query_params.clear()
+lap("Creators list")
 
 
     # ---- CENTRE: Student Feed ----
 NO_PREVIEW_IMAGE = "https://i.imgur.com/sUFH1Aq.png"  # Your own placeholder image here
 
-with ccol:
+# Latest-post fields each feed card reads, per platform
+FEED_POST_COLUMNS = {
+    p['prefix']: [f"{p['prefix']}_{c}" for c in ["LaPostCaption", "LaPostURL", "LaPostComments", "LaPostPreview"]]
+    + {"LI": ["LI_Username", "LI_Followers", "LI_Connections"],
+       "YT": ["YT_Username", "YT_Followers", "YT_ChannelTitle", "YT_ChannelViews"]}.get(p['prefix'], [])
+    for p in PLATFORMS
+}
+
+def feed_card_html(plat, user_val, foll_val, stats, post, date_val, is_main, is_new):
+    # One Student Feed platform card; "" when there is nothing to show.
+    latest_foll, follower_growth, engagement, likes_val = stats
+    prefix = plat["prefix"]
+    cap_val = safe(post.get(f"{prefix}_LaPostCaption", ""))
+    url_val = safe(post.get(f"{prefix}_LaPostURL", ""))
+    comm_val = parse_number(post.get(f"{prefix}_LaPostComments", 0))
+    preview_url = safe(post.get(f"{prefix}_LaPostPreview", ""))
+
+    cap_trunc = (cap_val[:110] + "…") if cap_val and len(cap_val) > 110 else cap_val
+    cap_trunc = sanitize_html(cap_trunc)
+    cap_val = sanitize_html(cap_val)
+    date_display = sanitize_html(date_val)
+    url_val = sanitize_html(url_val)
+    preview_url = sanitize_html(preview_url)
+
+    likes_display = f"{int(round(likes_val)):,}" if likes_val else ""
+    comm_display = f"{int(round(comm_val)):,}" if comm_val else ""
+    foll_display = f"{int(round(foll_val)):,}" if foll_val else ""
+    growth_display = (
+        f"<span style='background:#ebfdc1;border-radius:8px;padding:.20em .7em;margin-left:.4em;font-weight:700;color:#2b8328;'>+{int(follower_growth):,}</span>" if follower_growth > 0 else
+        f"<span style='background:#fde1e1;border-radius:8px;padding:.20em .7em;margin-left:.4em;font-weight:700;color:#c81c1c;'>{int(follower_growth):,}</span>" if follower_growth < 0 else
+        ""
+    )
+    engagement_display = (
+        f"<span style='background:#ebfdc1;border-radius:8px;padding:.19em .6em;margin-left:.4em;font-weight:700;color:#7fa569;'>{engagement:.1f}%</span>" if engagement else ""
+    )
+
+    # Card highlight logic unchanged
+    is_trending = (follower_growth and follower_growth > 30) or (engagement and engagement > 10)
+    badge_html = ""
+    if is_new:
+        badge_html += " <span style='font-size:1.3em;' title='New this week'>🆕</span>"
+    if is_trending:
+        badge_html += " <span style='font-size:1.3em;' title='Trending!'>🔥</span>"
+    if engagement > 20:
+        badge_html += " <span style='font-size:1.2em;'>💯</span>"
+    if follower_growth > 50:
+        badge_html += " <span style='font-size:1.2em;'>🚀</span>"
+
+    highlight = (
+        "box-shadow:0 8px 32px #e1306c15;"
+        if is_main and foll_val > 0 else ""
+    )
+    if engagement and engagement > 10:
+        highlight += "box-shadow:0 0 12px #fa7a3a44;"
+
+    card_has_content = (
+        (cap_trunc and cap_trunc.strip() != "") or
+        url_val or likes_display or comm_display or date_display
+    )
+    if not card_has_content:
+        return ""
+
+    lines = []
+
+    # --- Robust image preview logic ---
+    display_url = preview_url if (preview_url and preview_url.startswith("http")) else NO_PREVIEW_IMAGE
+
+    if display_url and display_url != NO_PREVIEW_IMAGE:
+        if url_val:
+            lines.append(
+                f"<a href='{url_val}' target='_blank'>"
+                f"<img src='{display_url}' width='120' style='border-radius:12px;box-shadow:0 1px 8px #0002;margin:2px 0 10px 0;max-width:170px;object-fit:cover;display:block;' alt='Post preview'/>"
+                f"</a>"
+            )
+        else:
+            lines.append(
+                f"<img src='{display_url}' width='120' style='border-radius:12px;box-shadow:0 1px 8px #0002;margin:2px 0 10px 0;max-width:170px;object-fit:cover;display:block;' alt='Post preview'/>"
+            )
+    else:
+        lines.append(
+            f"<img src='{NO_PREVIEW_IMAGE}' width='120' style='border-radius:12px;box-shadow:0 1px 8px #0002;margin:2px 0 10px 0;max-width:170px;object-fit:cover;display:block;opacity:0.45;' alt='No preview available'/>"
+        )
+        if url_val:
+            lines.append(
+                f"<div style='font-size:1.08em;margin-bottom:3px;'>"
+                f"<a href='{url_val}' target='_blank' style='color:{plat['brand']};font-weight:600;text-decoration:underline;'>View Post</a>"
+                f"</div>"
+            )
+
+    # --- LinkedIn SPECIAL: add username, followers, connections ---
+    if plat["label"] == "LinkedIn":
+        li_username = safe(post.get("LI_Username", ""))
+        li_followers = safe(post.get("LI_Followers", ""))
+        li_connections = safe(post.get("LI_Connections", ""))
+        lines.append(
+            f"<div style='margin-bottom:2px;font-size:1.05em;'><b>Username:</b> {li_username} &nbsp; | &nbsp; <b>Followers:</b> {li_followers} &nbsp; | &nbsp; <b>Connections:</b> {li_connections}</div>"
+        )
+    # --- YouTube SPECIAL: add username, followers, channel title, channel views ---
+    if plat["label"] == "YouTube":
+        yt_username = safe(post.get("YT_Username", ""))
+        yt_followers = safe(post.get("YT_Followers", ""))
+        yt_channel_title = safe(post.get("YT_ChannelTitle", ""))
+        yt_channel_views = safe(post.get("YT_ChannelViews", ""))
+        lines.append(
+            f"<div style='margin-bottom:2px;font-size:1.05em;'><b>Username:</b> {yt_username} &nbsp; | &nbsp; <b>Followers:</b> {yt_followers} &nbsp; | &nbsp; <b>Channel:</b> {yt_channel_title} &nbsp; | &nbsp; <b>Views:</b> {yt_channel_views}</div>"
+        )
+
+    # --- Caption as clickable or colored ---
+    if cap_trunc:
+        if url_val:
+            lines.append(
+                f"<div style='font-size:1.09em;'>"
+                f"<a href='{url_val}' target='_blank' style='color:{plat['brand']};font-weight:700;text-decoration:underline;'>{cap_trunc}</a>"
+                f"</div>"
+            )
+        else:
+            lines.append(
+                f"<div style='font-size:1.09em;color:{plat['brand']};font-weight:700;text-decoration:underline;'>{cap_trunc}</div>"
+            )
+
+    # --- Date, likes, comments (single line) ---
+    stat_line = []
+    if date_display:
+        stat_line.append(f"<span style='color:#aaa;'>{date_display}</span>")
+    if likes_display:
+        stat_line.append(f"👍 <b>{likes_display}</b>")
+    if comm_display:
+        stat_line.append(f"💬 <b>{comm_display}</b>")
+    if stat_line:
+        lines.append(
+            f"<div style='color:#232323;font-size:1.06em;margin-top:2px;'>{' &nbsp; '.join(stat_line)}</div>"
+        )
+
+    info_lines = "\n".join(lines)
+
+    return (
+f"""
+<div style="background:#fff;border-radius:22px;box-shadow:0 4px 16px #0001;{highlight}
+    border-top:8px solid {plat['brand']};margin-bottom:1.5em;padding:2em 2em 1.2em 2em;">
+    <div style='display:flex;align-items:center;gap:18px;margin-bottom:.6em;'>
+        <img src='{plat["emoji"]}' width=52 height=52 style='border-radius:17px;background:{plat["brand"]};padding:6px;box-shadow:0 2px 14px {plat["brand"]}22;'>
+        <span style="font-size:1.22em;font-weight:700;color:{plat['brand']};margin-bottom:.15em;">{plat['label']}{badge_html}</span>
+    </div>
+    <div style="color:#90a7d0;">
+        @{user_val}{f" &nbsp; • &nbsp; <b>{foll_display}</b> Followers" if foll_display else ""}
+        {growth_display}{engagement_display}
+    </div>
+    {info_lines}
+</div>
+"""
+    )
+
+# Each panel is a fragment: its own widgets rerun only that panel, not the page.
+@st.fragment
+@perf_stage("Student Feed")
+def student_feed():
     st.markdown("#### Student Feed")
     selected_student = st.session_state.selected_student
     show_df = curr_df[curr_df['Name'] == selected_student] if selected_student in curr_df['Name'].values else curr_df.head(1)
@@ -332,7 +1217,6 @@ with ccol:
             <span>🎓 {course:.1f}%</span>
         </div>
         """, unsafe_allow_html=True)
-        main_platform = max(PLATFORMS, key=lambda p: parse_number(row.get(p['foll'], 0)))
 
         for plat in PLATFORMS:
             user_val = safe(row.get(plat["user"], ""))
@@ -341,326 +1225,149 @@ with ccol:
 
             foll_val = parse_number(row.get(plat["foll"], 0))
             prefix = plat["prefix"]
-            student_rows = df[(df['Name'] == row['Name']) & (~df[f"{prefix}_Followers"].isna())].copy()
-            student_rows = student_rows.sort_values("Date")
-            latest_foll = follower_growth = engagement = likes_val = comm_val = 0
-            date_val = cap_val = url_val = ""
-            if len(student_rows) > 0:
-                latest_row = student_rows.iloc[-1]
-                latest_foll = parse_number(latest_row.get(f"{prefix}_Followers", 0))
-                prev_rows = student_rows[student_rows["Date"] <= latest_row["Date"] - pd.Timedelta(days=GROWTH_DAYS)]
-                if len(prev_rows) > 0:
-                    prev_foll = parse_number(prev_rows.iloc[-1].get(f"{prefix}_Followers", 0))
-                else:
-                    prev_foll = parse_number(student_rows.iloc[0].get(f"{prefix}_Followers", 0))
-                follower_growth = latest_foll - prev_foll
-
-                likes_val = parse_number(latest_row.get(f"{prefix}_LaPostLikes", 0))
-                engagement = (likes_val / latest_foll * 100) if latest_foll else 0
-
+            stats = (0, 0, 0, 0)
+            post = {}
+            date_val = ""
+            if (row['Name'], prefix) in growth.index:
+                g = growth.loc[(row['Name'], prefix)]
+                latest_row = df.loc[g["row"]]
+                stats = (g["latest_foll"], g["growth"], g["engagement"], g["likes"])
+                post = latest_row.reindex([c for c in FEED_POST_COLUMNS[prefix] if c in latest_row.index]).to_dict()
                 date_val = safe(format_post_date(latest_row.get(f"{prefix}_LaPostDate", "")))
-                cap_val = safe(latest_row.get(f"{prefix}_LaPostCaption", ""))
-                url_val = safe(latest_row.get(f"{prefix}_LaPostURL", ""))
-                comm_val = parse_number(latest_row.get(f"{prefix}_LaPostComments", 0))
-                preview_url = safe(latest_row.get(f"{prefix}_LaPostPreview", "")) if f"{prefix}_LaPostPreview" in latest_row else ""
-            else:
-                preview_url = ""
-
-            cap_trunc = (cap_val[:110] + "…") if cap_val and len(cap_val) > 110 else cap_val
-            cap_trunc = sanitize_html(cap_trunc)
-            cap_val = sanitize_html(cap_val)
-            date_display = sanitize_html(date_val)
-            url_val = sanitize_html(url_val)
-            preview_url = sanitize_html(preview_url)
-
-            likes_display = f"{int(round(likes_val)):,}" if likes_val else ""
-            comm_display = f"{int(round(comm_val)):,}" if comm_val else ""
-            foll_display = f"{int(round(foll_val)):,}" if foll_val else ""
-            growth_display = (
-                f"<span style='background:#ebfdc1;border-radius:8px;padding:.20em .7em;margin-left:.4em;font-weight:700;color:#2b8328;'>+{int(follower_growth):,}</span>" if follower_growth > 0 else
-                f"<span style='background:#fde1e1;border-radius:8px;padding:.20em .7em;margin-left:.4em;font-weight:700;color:#c81c1c;'>{int(follower_growth):,}</span>" if follower_growth < 0 else
-                ""
+            is_main = plat['label'] == row['Primary_Platform']
+            is_new = post_is_new(date_val)
+            card_html = memo_html(
+                ("feed", row['Name'], prefix, content_hash(user_val, foll_val, stats, post, date_val, is_main, is_new)),
+                lambda: feed_card_html(plat, user_val, foll_val, stats, post, date_val, is_main, is_new),
             )
-            engagement_display = (
-                f"<span style='background:#ebfdc1;border-radius:8px;padding:.19em .6em;margin-left:.4em;font-weight:700;color:#7fa569;'>{engagement:.1f}%</span>" if engagement else ""
-            )
-
-            # Card highlight logic unchanged
-            is_new = False
-            is_trending = False
-            try:
-                post_date = pd.to_datetime(date_val)
-                is_new = post_date > (pd.Timestamp.now() - pd.Timedelta(days=7))
-            except Exception:
-                is_new = False
-            is_trending = (follower_growth and follower_growth > 30) or (engagement and engagement > 10)
-            badge_html = ""
-            if is_new:
-                badge_html += " <span style='font-size:1.3em;' title='New this week'>🆕</span>"
-            if is_trending:
-                badge_html += " <span style='font-size:1.3em;' title='Trending!'>🔥</span>"
-            if engagement > 20:
-                badge_html += " <span style='font-size:1.2em;'>💯</span>"
-            if follower_growth > 50:
-                badge_html += " <span style='font-size:1.2em;'>🚀</span>"
-
-            highlight = (
-                "box-shadow:0 8px 32px #e1306c15;"
-                if plat['label'] == main_platform['label'] and foll_val > 0 else ""
-            )
-            if engagement and engagement > 10:
-                highlight += "box-shadow:0 0 12px #fa7a3a44;"
-
-            card_has_content = (
-                (cap_trunc and cap_trunc.strip() != "") or
-                url_val or likes_display or comm_display or date_display
-            )
-            if not card_has_content:
-                continue
-
-            lines = []
-
-            # --- Robust image preview logic ---
-            display_url = preview_url if (preview_url and preview_url.startswith("http")) else NO_PREVIEW_IMAGE
+            if card_html:
+                st.markdown(card_html, unsafe_allow_html=True)
+
+@st.fragment
+@perf_stage("Leaderboard")
+def leaderboard_panel():
+    st.markdown("#### Leaderboard")
+    plat_options = [p['label'] for p in PLATFORMS]
+    metric_options = METRICS
+    lb_plat = st.selectbox("Platform", plat_options, index=0, key="lbplat_selectbox_leaderboard")
+    lb_metric = st.selectbox("Metric", metric_options, index=0, key="lbmet_selectbox_leaderboard")
+    prefix = [p['prefix'] for p in PLATFORMS if p['label'] == lb_plat][0]
+    plat = next(p for p in PLATFORMS if p['label'] == lb_plat)
+    color = plat['brand']
+    foll_col = f"{prefix}_Followers"
 
-            if display_url and display_url != NO_PREVIEW_IMAGE:
-                if url_val:
-                    lines.append(
-                        f"<a href='{url_val}' target='_blank'>"
-                        f"<img src='{display_url}' width='120' style='border-radius:12px;box-shadow:0 1px 8px #0002;margin:2px 0 10px 0;max-width:170px;object-fit:cover;display:block;' alt='Post preview'/>"
-                        f"</a>"
-                    )
-                else:
-                    lines.append(
-                        f"<img src='{display_url}' width='120' style='border-radius:12px;box-shadow:0 1px 8px #0002;margin:2px 0 10px 0;max-width:170px;object-fit:cover;display:block;' alt='Post preview'/>"
-                    )
-            else:
-                lines.append(
-                    f"<img src='{NO_PREVIEW_IMAGE}' width='120' style='border-radius:12px;box-shadow:0 1px 8px #0002;margin:2px 0 10px 0;max-width:170px;object-fit:cover;display:block;opacity:0.45;' alt='No preview available'/>"
-                )
-                if url_val:
-                    lines.append(
-                        f"<div style='font-size:1.08em;margin-bottom:3px;'>"
-                        f"<a href='{url_val}' target='_blank' style='color:{plat['brand']};font-weight:600;text-decoration:underline;'>View Post</a>"
-                        f"</div>"
-                    )
-
-            # --- LinkedIn SPECIAL: add username, followers, connections ---
-            if plat["label"] == "LinkedIn":
-                li_username = safe(latest_row.get("LI_Username", ""))
-                li_followers = safe(latest_row.get("LI_Followers", ""))
-                li_connections = safe(latest_row.get("LI_Connections", ""))
-                lines.append(
-                    f"<div style='margin-bottom:2px;font-size:1.05em;'><b>Username:</b> {li_username} &nbsp; | &nbsp; <b>Followers:</b> {li_followers} &nbsp; | &nbsp; <b>Connections:</b> {li_connections}</div>"
-                )
-            # --- YouTube SPECIAL: add username, followers, channel title, channel views ---
-            if plat["label"] == "YouTube":
-                yt_username = safe(latest_row.get("YT_Username", ""))
-                yt_followers = safe(latest_row.get("YT_Followers", ""))
-                yt_channel_title = safe(latest_row.get("YT_ChannelTitle", ""))
-                yt_channel_views = safe(latest_row.get("YT_ChannelViews", ""))
-                lines.append(
-                    f"<div style='margin-bottom:2px;font-size:1.05em;'><b>Username:</b> {yt_username} &nbsp; | &nbsp; <b>Followers:</b> {yt_followers} &nbsp; | &nbsp; <b>Channel:</b> {yt_channel_title} &nbsp; | &nbsp; <b>Views:</b> {yt_channel_views}</div>"
-                )
-
-            # --- Caption as clickable or colored ---
-            if cap_trunc:
-                if url_val:
-                    lines.append(
-                        f"<div style='font-size:1.09em;'>"
-                        f"<a href='{url_val}' target='_blank' style='color:{plat['brand']};font-weight:700;text-decoration:underline;'>{cap_trunc}</a>"
-                        f"</div>"
-                    )
-                else:
-                    lines.append(
-                        f"<div style='font-size:1.09em;color:{plat['brand']};font-weight:700;text-decoration:underline;'>{cap_trunc}</div>"
-                    )
-
-            # --- Date, likes, comments (single line) ---
-            stat_line = []
-            if date_display:
-                stat_line.append(f"<span style='color:#aaa;'>{date_display}</span>")
-            if likes_display:
-                stat_line.append(f"👍 <b>{likes_display}</b>")
-            if comm_display:
-                stat_line.append(f"💬 <b>{comm_display}</b>")
-            if stat_line:
-                lines.append(
-                    f"<div style='color:#232323;font-size:1.06em;margin-top:2px;'>{' &nbsp; '.join(stat_line)}</div>"
-                )
-
-            info_lines = "\n".join(lines)
-
-            st.markdown(
-f"""
-<div style="background:#fff;border-radius:22px;box-shadow:0 4px 16px #0001;{highlight}
-    border-top:8px solid {plat['brand']};margin-bottom:1.5em;padding:2em 2em 1.2em 2em;">
-    <div style='display:flex;align-items:center;gap:18px;margin-bottom:.6em;'>
-        <img src='{plat["emoji"]}' width=52 height=52 style='border-radius:17px;background:{plat["brand"]};padding:6px;box-shadow:0 2px 14px {plat["brand"]}22;'>
-        <span style="font-size:1.22em;font-weight:700;color:{plat['brand']};margin-bottom:.15em;">{plat['label']}{badge_html}</span>
-    </div>
-    <div style="color:#90a7d0;">
-        @{user_val}{f" &nbsp; • &nbsp; <b>{foll_display}</b> Followers" if foll_display else ""}
-        {growth_display}{engagement_display}
-    </div>
-    {info_lines}
-</div>
-""",
-                unsafe_allow_html=True
+    if 'Date' in df.columns and not df.empty:
+        date_vals = df['Date'].dropna()
+        if not date_vals.empty:
+            min_date = date_vals.min()
+            max_date = date_vals.max()
+            lb_date_range = st.date_input(
+                "Leaderboard date range",
+                value=(min_date, max_date),
+                min_value=min_date,
+                max_value=max_date,
+                key="lb_date_range"
             )
-
-    # ---- RIGHT: Leaderboard ----
-    with rcol:
-        st.markdown("#### Leaderboard")
-        plat_options = [p['label'] for p in PLATFORMS]
-        metric_options = ['Followers', 'Engagement', 'Follower Growth']
-        lb_plat = st.selectbox("Platform", plat_options, index=0, key="lbplat_selectbox_leaderboard")
-        lb_metric = st.selectbox("Metric", metric_options, index=0, key="lbmet_selectbox_leaderboard")
-        prefix = [p['prefix'] for p in PLATFORMS if p['label'] == lb_plat][0]
-        plat = next(p for p in PLATFORMS if p['label'] == lb_plat)
-        color = plat['brand']
-        foll_col = f"{prefix}_Followers"
-
-        if 'Date' in df.columns and not df.empty:
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-            date_vals = df['Date'].dropna()
-            if not date_vals.empty:
-                min_date = date_vals.min()
-                max_date = date_vals.max()
-                lb_date_range = st.date_input(
-                    "Leaderboard date range",
-                    value=(min_date, max_date),
-                    min_value=min_date,
-                    max_value=max_date,
-                    key="lb_date_range"
-                )
-                if isinstance(lb_date_range, tuple):
-                    lb_start_date, lb_end_date = lb_date_range
-                else:
-                    lb_start_date = lb_end_date = lb_date_range
-                lb_mask = (df['Date'] >= pd.to_datetime(lb_start_date)) & (df['Date'] <= pd.to_datetime(lb_end_date))
-                plot_df_lb = df[lb_mask].copy()
+            if isinstance(lb_date_range, tuple):
+                lb_start_date, lb_end_date = lb_date_range
             else:
-                st.warning("No available dates in the data for leaderboard.")
-                plot_df_lb = df.copy()
+                lb_start_date = lb_end_date = lb_date_range
         else:
-            plot_df_lb = df.copy()
-
-        if lb_metric == "Followers":
-            latest = plot_df_lb.sort_values("Date").groupby("StudentID").last().reset_index()
-            latest[foll_col] = latest[foll_col].apply(parse_number)
-            y_col = foll_col
-            display_df = latest.sort_values(y_col, ascending=False)
-            values = display_df[y_col]
-        elif lb_metric == "Follower Growth":
-            grp = plot_df_lb.sort_values("Date").groupby("StudentID")
-            first = grp.first().reset_index()
-            last = grp.last().reset_index()
-            growth_df = last[["StudentID", "Name", foll_col]].copy()
-            growth_df = growth_df.rename(columns={foll_col: "Followers_End"})
-            growth_df["Followers_Start"] = first.set_index("StudentID")[foll_col].values
-            growth_df["Followers_End"] = growth_df["Followers_End"].apply(parse_number)
-            growth_df["Followers_Start"] = growth_df["Followers_Start"].apply(parse_number)
-            growth_df["Growth"] = growth_df["Followers_End"] - growth_df["Followers_Start"]
-            display_df = growth_df.sort_values("Growth", ascending=False)
-            values = display_df["Growth"]
-        else:  # Engagement
-            likes_col = f"{prefix}_LaPostLikes"
-            latest = plot_df_lb.sort_values("Date").groupby("StudentID").last().reset_index()
-            latest[likes_col] = latest[likes_col].apply(parse_number)
-            latest[foll_col] = latest[foll_col].apply(parse_number)
-            latest['eng'] = latest.apply(
-                lambda r: float(r.get(likes_col, 0)) / float(r.get(foll_col, 1)) if float(r.get(foll_col, 1)) else 0,
-                axis=1
-            )
-            latest['eng'] = latest['eng'] * 100
-            display_df = latest.sort_values('eng', ascending=False)
-            values = display_df['eng']
-
-        st.markdown('<div style="margin-top:.7em;">', unsafe_allow_html=True)
-        for rank, (_, r) in enumerate(display_df.iterrows()):
-            initials = student_initials(r['Name'])
-            highlight = (
-                "background:linear-gradient(97deg,#fcb69f33 60%,#a1c4fd13 100%);border-radius:13px;"
-                if r['Name'] == st.session_state.selected_student else ""
-            )
-            val = values.iloc[rank]
-            if lb_metric in ["Followers", "Follower Growth"]:
-                metric_str = f"{int(round(val)):,}" if val else "0"
-            else:
-                metric_str = f"{val:.1f}%"
-            if rank == 0:
-                medal = '<span style="font-size:1.15em;color:#e1b400;margin-right:3px;">🥇</span>'
-            elif rank == 1:
-                medal = '<span style="font-size:1.15em;color:#bbb;margin-right:3px;">🥈</span>'
-            elif rank == 2:
-                medal = '<span style="font-size:1.15em;color:#cd7f32;margin-right:3px;">🥉</span>'
-            else:
-                medal = f'<span style="width:18px;display:inline-block;">{rank+1}</span>'
-            render_leaderboard_card(
-                name=r['Name'],
-                initials=initials,
-                metric_str=metric_str,
-                color=color,
-                highlight=highlight,
-                medal=medal
-            )
-    
-# --- ANALYTICS TAB ---
-with menu_tabs[1]:
-    st.title("Analytics")
-    all_students = sorted(df['Name'].dropna().unique())
-    student_filter = st.selectbox(
-        "Student (optional)",
-        options=["All Students"] + all_students,
-        key="analytics_student"
-    )
-    platform_options = [p['label'] for p in PLATFORMS]
-    selected_platform = st.selectbox("Platform", platform_options, key="analytics_platform")
-    metric_options = ['Followers', 'Engagement', 'Follower Growth']
-    selected_metric = st.selectbox("Metric", metric_options, key="analytics_metric")
-    prefix = [p['prefix'] for p in PLATFORMS if p['label'] == selected_platform][0]
-    foll_col = f"{prefix}_Followers"
-
-    filtered_df = df.copy()
-    if student_filter != "All Students":
-        filtered_df = filtered_df[filtered_df['Name'] == student_filter]
-    heatmap_student = st.selectbox("Show heatmap for student", ["All Students"] + all_students, key="heatmap_student")
-    if heatmap_student == "All Students":
-        heatmap_df = df.copy()
+            st.warning("No available dates in the data for leaderboard.")
+            lb_start_date = lb_end_date = None
     else:
-        heatmap_df = df[df['Name'] == heatmap_student].copy()
+        lb_start_date = lb_end_date = None
 
-    # Make sure Date is datetime
-    heatmap_df['Date'] = pd.to_datetime(heatmap_df['Date'], errors='coerce')
-    heatmap_df = heatmap_df.dropna(subset=['Date'])
-
-    # Count posts per day
-    post_counts = heatmap_df.groupby(heatmap_df['Date'].dt.date).size().reset_index(name='Posts')
+    if covers_history(lb_start_date, lb_end_date):
+        y_col, ranked = leaderboard_cube(df, data_version)[(prefix, lb_metric)]
+    else:
+        display_df, y_col = metric_frame(
+            snapshot_between(lb_start_date, lb_end_date), history_index(df, data_version),
+            prefix, lb_metric, lb_start_date, lb_end_date
+        )
+        ranked = rank_students(display_df, y_col)
 
-    # Create a full calendar for the period
-    if not post_counts.empty:
-        date_range = pd.date_range(post_counts['Date'].min(), post_counts['Date'].max(), freq="D")
-        calendar_df = pd.DataFrame({'Date': date_range})
-        calendar_df['Date'] = pd.to_datetime(calendar_df['Date'])
-        calendar_df['Posts'] = calendar_df['Date'].dt.date.map(dict(zip(post_counts['Date'], post_counts['Posts']))).fillna(0)
-        calendar_df['Posts'] = calendar_df['Posts'].astype(int)
-        calendar_df['dow'] = calendar_df['Date'].dt.weekday  # 0 = Monday
-        calendar_df['week'] = calendar_df['Date'].dt.isocalendar().week
-        calendar_df['year'] = calendar_df['Date'].dt.isocalendar().year
+    st.markdown(
+        leaderboard_html(ranked, y_col, lb_metric, color, st.session_state.selected_student),
+        unsafe_allow_html=True
+    )
 
-        # Pivot to weeks x days grid
-        pivot = calendar_df.pivot(index='week', columns='dow', values='Posts').fillna(0)
+with ccol:
+    student_feed()
+
+# ---- RIGHT: Leaderboard ----
+with rcol:
+    leaderboard_panel()
+
+# ---- Content heatmap ----
+# Day x ISO-week post counts, cached per student and data version.
+@tracked("post_heatmap", st.cache_data(max_entries=32))
+def post_heatmap(_df, version, student):
+    art = precomputed(version)
+    if art is not None and student == "All Students":
+        return art["heatmap"]
+    return pipeline.post_heatmap(_df, student)
+
+# ---- Follower trend ----
+TREND_POINTS = 400  # per student; longer series are downsampled with LTTB
+
+def lttb(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: indices of n_out points that keep the series' shape.
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_hi = edges[i + 2] if i + 2 < len(edges) else n
+        cx, cy = x[hi:nxt_hi].mean(), y[hi:nxt_hi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+@tracked("trend_figure", st.cache_data(max_entries=32))
+def trend_figure(_window, version, names, foll_col, start, end, title):
+    # Keyed by everything that decides the rows (version, students, column, range) plus the title.
+    trend_df = _window[_window['Name'].isin(names)].copy()
+    trend_df[foll_col] = parse_numbers(trend_df[foll_col])
+    parts = []
+    for _, series in trend_df.groupby("Name", observed=True, sort=False):
+        if len(series) > TREND_POINTS:
+            series = series[series[foll_col].notna()]
+            x = series['Date'].to_numpy().astype("datetime64[s]").astype(float)
+            series = series.iloc[lttb(x, series[foll_col].to_numpy(dtype=float), TREND_POINTS)]
+        parts.append(series)
+    if parts:
+        trend_df = pd.concat(parts)
+    return px.line(
+        trend_df,
+        x="Date",
+        y=foll_col,
+        color="Name",
+        title=title,
+        markers=True,
+        render_mode="webgl",
+    )
 
+@st.fragment
+@perf_stage("Heatmap")
+def heatmap_panel(all_students):
+    heatmap_student = st.selectbox("Show heatmap for student", ["All Students"] + all_students, key="heatmap_student")
+    heatmap = post_heatmap(df, data_version, heatmap_student)
+    if heatmap is not None:
         # Build heatmap
         fig = go.Figure(
             data=go.Heatmap(
-                z=pivot.values,
+                z=heatmap["z"],
                 x=['Mon','Tue','Wed','Thu','Fri','Sat','Sun'],
-                y=[f"Week {w}" for w in pivot.index],
+                y=heatmap["weeks"],
                 colorscale="YlGnBu",
                 showscale=True,
-                hovertemplate="Week %{y}, %{x}: %{z} posts<extra></extra>"
+                hovertemplate="%{y}, %{x}: %{z} posts<extra></extra>"
             )
         )
         fig.update_layout(
@@ -674,8 +1381,28 @@ with menu_tabs[1]:
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.info("No post data to show heatmap for this student.")
+
+@st.fragment
+def analytics_panel():
+    lap = perf_laps()
+    all_students = sorted(df['Name'].dropna().unique())
+    student_filter = st.selectbox(
+        "Student (optional)",
+        options=["All Students"] + all_students,
+        key="analytics_student"
+    )
+    platform_options = [p['label'] for p in PLATFORMS]
+    selected_platform = st.selectbox("Platform", platform_options, key="analytics_platform")
+    metric_options = METRICS
+    selected_metric = st.selectbox("Metric", metric_options, key="analytics_metric")
+    prefix = [p['prefix'] for p in PLATFORMS if p['label'] == selected_platform][0]
+    foll_col = f"{prefix}_Followers"
+
+    filtered_df = df
+    if student_filter != "All Students":
+        filtered_df = filtered_df[filtered_df['Name'] == student_filter]
+    heatmap_panel(all_students)
     if 'Date' in filtered_df.columns and not filtered_df.empty:
-        filtered_df['Date'] = pd.to_datetime(filtered_df['Date'], errors='coerce')
         date_vals = filtered_df['Date'].dropna()
         if not date_vals.empty:
             min_date = date_vals.min()
@@ -690,94 +1417,73 @@ with menu_tabs[1]:
                 start_date, end_date = date_range
             else:
                 start_date = end_date = date_range
-            mask = (filtered_df['Date'] >= pd.to_datetime(start_date)) & (filtered_df['Date'] <= pd.to_datetime(end_date))
-            plot_df = filtered_df[mask].copy()
+            plot_df = date_window(filtered_df, start_date, end_date)
         else:
             st.warning("No available dates in the data.")
-            plot_df = filtered_df.copy()
+            plot_df = filtered_df
             start_date = end_date = None
     else:
         st.warning("No 'Date' column in your data.")
-        plot_df = filtered_df.copy()
+        plot_df = filtered_df
         start_date = end_date = None
 
-    if selected_metric == "Followers":
-        latest = plot_df.sort_values("Date").groupby("StudentID").last().reset_index()
-        latest[foll_col] = latest[foll_col].apply(parse_number)
-        y_col = foll_col
-        title_metric = "Followers"
-        display_df = latest
-    elif selected_metric == "Follower Growth":
-        grp = plot_df.sort_values("Date").groupby("StudentID")
-        first = grp.first().reset_index()
-        last = grp.last().reset_index()
-        growth_df = last[["StudentID", "Name", foll_col]].copy()
-        growth_df = growth_df.rename(columns={foll_col: "Followers_End"})
-        growth_df["Followers_Start"] = first.set_index("StudentID")[foll_col].values
-        growth_df["Followers_End"] = growth_df["Followers_End"].apply(parse_number)
-        growth_df["Followers_Start"] = growth_df["Followers_Start"].apply(parse_number)
-        growth_df["Growth"] = growth_df["Followers_End"] - growth_df["Followers_Start"]
-        display_df = growth_df.copy()
-        y_col = "Growth"
-        title_metric = "Follower Growth"
+    def analytics_snapshot():
+        snap = snapshot_between(start_date, end_date)
+        if student_filter != "All Students":
+            snap = snap[snap['Name'] == student_filter].reset_index(drop=True)
+        return snap
+
+    display_df, y_col = metric_frame(analytics_snapshot(), history_index(df, data_version), prefix, selected_metric, start_date, end_date)
+    if selected_metric == "Follower Growth" and student_filter != "All Students":
+        display_df = display_df[display_df['Name'] == student_filter].reset_index(drop=True)
+    title_metric = "Engagement (%)" if selected_metric == "Engagement" else selected_metric
+    if student_filter == "All Students" and covers_history(start_date, end_date):
+        ranked = leaderboard_cube(df, data_version)[(prefix, selected_metric)][1]
     else:
-        likes_col = f"{prefix}_LaPostLikes"
-        latest = plot_df.sort_values("Date").groupby("StudentID").last().reset_index()
-        latest[likes_col] = latest[likes_col].apply(parse_number)
-        latest[foll_col] = latest[foll_col].apply(parse_number)
-        latest['eng'] = latest.apply(
-            lambda r: float(r.get(likes_col, 0)) / float(r.get(foll_col, 1)) if float(r.get(foll_col, 1)) else 0,
-            axis=1
-        )
-        latest['eng'] = latest['eng'] * 100
-        display_df = latest
-        y_col = "eng"
-        title_metric = "Engagement (%)"
+        ranked = rank_students(display_df, y_col)
+    lap("Analytics metrics")
 
     st.markdown("### Follower Trend Over Time")
-    timeseries_df = plot_df.sort_values("Date")
+    timeseries_df = plot_df
     if not timeseries_df.empty and foll_col in timeseries_df.columns:
         if student_filter == "All Students":
-            top_students = display_df.sort_values(y_col, ascending=False).head(5)['Name']
+            top_students = ranked.head(5)['Name']
         else:
             top_students = [student_filter]
-        trend_df = timeseries_df[timeseries_df['Name'].isin(top_students)].copy()
-        trend_df['Date'] = pd.to_datetime(trend_df['Date'])
-        trend_df[foll_col] = trend_df[foll_col].apply(parse_number)
-        fig = px.line(
-            trend_df,
-            x="Date",
-            y=foll_col,
-            color="Name",
-            title=f"Follower Trend for {'Top 5' if student_filter=='All Students' else student_filter} on {selected_platform}",
-            markers=True,
+        fig = trend_figure(
+            timeseries_df, data_version, tuple(top_students), foll_col, str(start_date), str(end_date),
+            f"Follower Trend for {'Top 5' if student_filter=='All Students' else student_filter} on {selected_platform}",
         )
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.info("No time series data for this metric.")
+    lap("Follower trend")
 
     st.markdown("### Top 10 (Bar Chart)")
     if not display_df.empty:
         plot_name = "Name" if "Name" in display_df.columns else "StudentID"
         fig = px.bar(
-            display_df.sort_values(y_col, ascending=False).head(10),
+            ranked,
             x=plot_name, y=y_col, color=y_col, color_continuous_scale="bluered",
             title=f"Top 10 {selected_platform} {title_metric} ({start_date} to {end_date})",
             labels={"y": title_metric, "x": "Student"}
         )
         st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
-        csv = display_df.to_csv(index=False).encode()
-        st.download_button("⬇️ Download This Table as CSV", csv, file_name="analytics_export.csv", mime="text/csv")
+        export_buttons(
+            display_df, ("analytics", data_version, student_filter, prefix, selected_metric, str(start_date), str(end_date)),
+            "Download This Table", "analytics_export"
+        )
     else:
         st.info("No data for selected date range or metric.")
+    lap("Top 10 chart")
 
     st.markdown("### Platform Mix Snapshot")
-    curr_snapshot = plot_df.sort_values("Date").groupby("StudentID").last().reset_index()
+    curr_snapshot = analytics_snapshot()
     pie_data = []
     for plat in PLATFORMS:
         col = f"{plat['prefix']}_Followers"
         if col in curr_snapshot.columns:
-            total = curr_snapshot[col].apply(parse_number).sum()
+            total = parse_numbers(curr_snapshot[col]).sum()
             pie_data.append({"platform": plat['label'], "followers": total})
     pie_df = pd.DataFrame(pie_data)
     if not pie_df.empty:
@@ -786,10 +1492,15 @@ with menu_tabs[1]:
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.info("No platform mix data.")
+    lap("Platform mix")
 
     with st.expander("📊 Show raw data table"):
         st.dataframe(display_df)
+    lap("Raw data table")
 
+@st.fragment
+@perf_stage("Weekly charts")
+def weekly_panel():
     st.header("Weekly Engagement Metrics")
     if df_weekly.empty:
         st.info("No weekly engagement data found.")
@@ -829,8 +1540,65 @@ with menu_tabs[1]:
             st.plotly_chart(fig, use_container_width=True)
             with st.expander(f"📊 Show data for {title}"):
                 st.dataframe(plot_df[["Name", "Week", col]])
-            csv = plot_df[["Name", "Week", col]].to_csv(index=False).encode()
-            st.download_button(f"⬇️ Download {title} Data as CSV", csv, file_name=f"{col}_weekly_export.csv", mime="text/csv")
+            # The weekly sheet isn't covered by data_version, so its exports are keyed by content.
+            export_buttons(plot_df[["Name", "Week", col]], None, f"Download {title} Data", f"{col}_weekly_export")
+
+# ---- Cohort comparison ----
+# Built from the per-cohort summaries only, so comparing cohorts never loads their rows.
+COHORT_METRICS = {
+    "Median followers": "median_followers",
+    "Total followers": "followers",
+    f"Follower growth ({GROWTH_DAYS} days)": "growth",
+    "Avg engagement (%)": "engagement",
+    "Active students": "students",
+}
+
+@st.fragment
+@perf_stage("Cohorts")
+def cohorts_panel():
+    summaries = {c: partitions[c]["summary"] for c in cohorts}
+    platforms = pd.concat([summaries[c]["platforms"].assign(Cohort=c) for c in cohorts], ignore_index=True)
+    platforms["Platform"] = platforms["prefix"].map({p['prefix']: p['label'] for p in PLATFORMS})
+    totals = platforms.groupby("Cohort", sort=False)[["followers", "growth"]].sum()
+    overview = pd.DataFrame([{
+        "Cohort": c,
+        "Students": summaries[c]["overview"]["students"],
+        "First day": summaries[c]["overview"]["first_date"],
+        "Latest data": summaries[c]["overview"]["last_date"],
+        "Followers": int(totals.loc[c, "followers"]),
+        f"Growth ({GROWTH_DAYS} days)": int(totals.loc[c, "growth"]),
+        "Videos / week": round(summaries[c]["overview"].get("videos_per_week", 0.0), 1),
+    } for c in cohorts])
+    st.dataframe(overview, hide_index=True, use_container_width=True)
+
+    metric = st.selectbox("Metric", list(COHORT_METRICS), key="cohorts_metric")
+    fig = px.bar(
+        platforms, x="Platform", y=COHORT_METRICS[metric], color="Cohort", barmode="group",
+        title=f"{metric} by platform", labels={COHORT_METRICS[metric]: metric},
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+    trajectory = pd.concat([summaries[c]["trajectory"].assign(Cohort=c) for c in cohorts], ignore_index=True)
+    fig = px.line(
+        trajectory, x="week", y="followers", color="Cohort", markers=True,
+        title="Average followers per student by bootcamp week",
+        labels={"week": "Week", "followers": "Followers per student"},
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+# --- ANALYTICS TAB ---
+with menu_tabs[1]:
+    if menu_tabs[1].open:
+        st.title("Analytics")
+        analytics_panel()
+        weekly_panel()
+
+# --- COHORTS TAB ---
+if len(menu_tabs) > 2:
+    with menu_tabs[2]:
+        if menu_tabs[2].open:
+            st.title("Cohorts")
+            cohorts_panel()
 st.markdown("""
     <hr style="margin-top:3em;margin-bottom:0;border:none;border-top:1.5px solid #fcb69f33;">
     <div style='text-align:center;color:#90a7d0;font-size:1.09em;margin-top:.6em;margin-bottom:0.3em;'>
@@ -838,3 +1606,33 @@ st.markdown("""
     </div>
     """, unsafe_allow_html=True)
 
+# ---- Performance panel ----
+def perf_panel():
+    counters = perf_counters()
+    with counters["lock"]:
+        caches = {name: dict(entry) for name, entry in counters["caches"].items()}
+        api_calls, fetch_ms, partition_ms = counters["api_calls"], counters["fetch_ms"], counters["partition_ms"]
+    flight_counts = {label: dict(c) for label, c in flights()["counts"].items()}
+    total_ms = (time.perf_counter() - perf_state["started"]) * 1000
+    with st.expander("⏱ Performance"):
+        st.caption(
+            f"Run {perf_state['runs']} · {total_ms:,.0f} ms · {perf_state['bytes'] / 1024:,.1f} KB sent · "
+            f"{api_calls} Sheets API calls · last sync: fetch {fetch_ms or 0:,.0f} ms, mirror and partitions {partition_ms or 0:,.0f} ms"
+        )
+        stages = pd.DataFrame([{"stage": stage, "ms": round(ms, 1)} for stage, ms in perf_state["stages"].items()])
+        st.dataframe(stages, hide_index=True, use_container_width=True)
+        cache_rows = []
+        for name, entry in sorted(caches.items()):
+            hits = max(entry["calls"] - entry["misses"], 0)
+            rate = hits / entry["calls"] if entry["calls"] else 0.0
+            cache_rows.append({"cache": name, "calls": entry["calls"], "hits": hits, "misses": entry["misses"], "hit rate": f"{rate:.0%}"})
+        st.dataframe(pd.DataFrame(cache_rows), hide_index=True, use_container_width=True)
+        if flight_counts:
+            st.caption(" · ".join(f"{label}: {c['fetches']} fetched, {c['deduped']} shared" for label, c in sorted(flight_counts.items())))
+    perf_log(
+        "run", run=perf_state["runs"], ms=round(total_ms, 2), bytes=perf_state["bytes"], api_calls=api_calls,
+        fetch_ms=fetch_ms, partition_ms=partition_ms, caches=caches, flights=flight_counts,
+    )
+
+if PERF_ON:
+    perf_panel()
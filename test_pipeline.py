@@ -0,0 +1,97 @@
+# Equivalence checks for the vectorized paths in pipeline.py against the plain
+# code they replaced.
+import numpy as np
+import pandas as pd
+
+import bench
+import pipeline
+
+def _fuzz_values(rng, n):
+    bodies = ["0", "1", "12", "1.5", "1,234", "12,345.6", "-3", ".5", "7.", "1e3", "1_000",
+              "nan", "NaN", "inf", "-inf", "abc", "K", "M", "1.2.3", "", " ", "none", "None",
+              "n/a", "N/A", "--", "0x10"]
+    values = []
+    for _ in range(n):
+        kind = rng.integers(6)
+        if kind == 0:
+            values.append(None)
+        elif kind == 1:
+            values.append(float(rng.normal(0, 1e5)))
+        elif kind == 2:
+            values.append(int(rng.integers(-10**6, 10**6)))
+        else:
+            body = bodies[rng.integers(len(bodies))] if kind == 3 else f"{rng.uniform(0, 1000):.{rng.integers(3)}f}"
+            suffix = ["", "", "k", "K", "m", "M"][rng.integers(6)]
+            pad = [" ", ""][rng.integers(2)]
+            values.append(pad + body + suffix + pad)
+    return values
+
+def test_parse_numbers_matches_parse_number():
+    values = _fuzz_values(np.random.default_rng(4), 5000)
+    expected = np.array([pipeline.parse_number(v) for v in values])
+    got = pipeline.parse_numbers(pd.Series(values, dtype=object)).to_numpy()
+    np.testing.assert_array_equal(got, expected)
+    text = [v for v in values if isinstance(v, str)]
+    got = pipeline.parse_numbers(pd.Series(text)).to_numpy()
+    np.testing.assert_array_equal(got, [pipeline.parse_number(v) for v in text])
+
+def test_parse_numbers_numeric_and_bool_columns():
+    floats = pd.Series([1.5, np.nan, -2.0, 1e9])
+    np.testing.assert_array_equal(pipeline.parse_numbers(floats).to_numpy(), [pipeline.parse_number(v) for v in floats])
+    ints = pd.Series([1, 0, -7])
+    np.testing.assert_array_equal(pipeline.parse_numbers(ints).to_numpy(), [1.0, 0.0, -7.0])
+    assert (pipeline.parse_numbers(pd.Series([True, False])) == 0.0).all()
+
+def test_search_short_queries_match_substrings():
+    snap = pd.DataFrame({"Name": ["Bob Stone", "Sarah Li", "Ahmed"], "StudentID": ["s1", "s2", "s3"]})
+    index = pipeline.search_index(snap)
+    assert pipeline.search_students(index, "ob") == [0]
+    assert sorted(pipeline.search_students(index, "ah")) == [1, 2]
+    assert len(pipeline.search_students(index, "s")) == 3
+
+def test_window_ends_match_groupby_first_last():
+    rng = np.random.default_rng(14)
+    df, _, _ = pipeline.prepare_frames(bench.synthetic_history(60, 40, seed=3), pd.DataFrame())
+    # Blank more readings so some students have none inside short windows.
+    df.loc[rng.random(len(df)) < 0.2, "IG_Followers"] = np.nan
+    index = pipeline.history_index(df)
+    days = df['Date'].dropna().unique()
+    for _ in range(200):
+        start, end = np.sort(rng.choice(days, 2)) + np.array(rng.integers(-3, 4, 2), dtype="timedelta64[D]")
+        rows = df[(df['Date'] >= start) & (df['Date'] <= end)]
+        expected = rows.groupby("StudentID", observed=True).agg(
+            Name=("Name", "last"), first=("IG_Followers", "first"), last=("IG_Followers", "last"))
+        ends = pipeline.window_ends(index, "IG_Followers", start, end).set_index("StudentID")
+        assert list(ends.index.astype(str)) == list(expected.index.astype(str))
+        assert list(ends["Name"].astype(str)) == list(expected["Name"].astype(str))
+        np.testing.assert_array_equal(ends["first"].to_numpy(float), expected["first"].to_numpy(float))
+        np.testing.assert_array_equal(ends["last"].to_numpy(float), expected["last"].to_numpy(float))
+        growth = pipeline.growth_between(index, "IG_Followers", start, end)
+        np.testing.assert_array_equal(
+            growth["Growth"].to_numpy(),
+            (pipeline.parse_numbers(expected["last"]) - pipeline.parse_numbers(expected["first"])).to_numpy())
+
+def test_window_ends_without_window_covers_history():
+    df, _, _ = pipeline.prepare_frames(bench.synthetic_history(20, 10), pd.DataFrame())
+    index = pipeline.history_index(df)
+    full = pipeline.window_ends(index, "TT_Followers")
+    dates = df['Date'].dropna()
+    ranged = pipeline.window_ends(index, "TT_Followers", dates.min(), dates.max())
+    pd.testing.assert_frame_equal(full, ranged)
+
+def test_search_fuzzy_only_without_direct_hits():
+    snap = pd.DataFrame({"Name": [f"Student {i}" for i in range(500)], "StudentID": [f"S{i:03d}" for i in range(500)]})
+    index = pipeline.search_index(snap)
+    hits = pipeline.search_students(index, "student 42")
+    assert hits[0] == 42
+    assert sorted(hits) == [i for i in range(500) if "student 42" in f"student {i}"]
+    assert pipeline.search_students(index, "studnet 42")[0] == 42
+    assert len(pipeline.search_students(index, "studnet 42")) < 10
+
+def test_leaderboard_cube_with_missing_columns():
+    df, _, _ = pipeline.prepare_frames(bench.synthetic_history(20, 5).drop(columns=["LI_LaPostLikes", "TH_Followers"]), pd.DataFrame())
+    cube = pipeline.leaderboard_cube(pipeline.latest_snapshot(df), pipeline.history_index(df))
+    assert len(cube) == len(pipeline.PLATFORM_PREFIXES) * len(pipeline.METRICS)
+    assert (cube[("LI", "Engagement")][1]["eng"] == 0).all()
+    assert (cube[("TH", "Followers")][1]["TH_Followers"] == 0).all()
+    assert (cube[("TH", "Follower Growth")][1]["Growth"] == 0).all()